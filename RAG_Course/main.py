@@ -1,8 +1,10 @@
 import streamlit as st
 import pandas as pd
-from src.config import DATA_PATH, DEFAULT_BM25_K1, DEFAULT_BM25_B, DEFAULT_ALPHA, DEFAULT_TEMPERATURE, DEFAULT_TOP_P
+from src.config import DATA_PATH, DEFAULT_BM25_K1, DEFAULT_BM25_B, DEFAULT_ALPHA, DEFAULT_TEMPERATURE, DEFAULT_TOP_P, DEFAULT_LATENCY_BUDGET_SECONDS
+from src.budget import RequestBudget
+from src.pipeline import answer_with_budget
 from src.data_processor import DataProcessor
-from src.retrievers import BM25Retriever, VectorRetriever, HybridRetriever
+from src.registry import RetrieverRegistry, RegistryFullError
 from src.reranker import Reranker
 from src.generator import Generator
 
@@ -14,11 +16,20 @@ This app is a hands-on implementation of the RAG Course.
 Explore how different parameters and techniques affect the performance and accuracy of a RAG system using Pakistani News data.
 """)
 
+# Shared across all sessions: the raw data, embedding model and built indexes are loaded once per process.
+@st.cache_resource
+def get_registry():
+    processor = DataProcessor(DATA_PATH)
+    return RetrieverRegistry(processor, processor.load_csvs())
+
+registry = get_registry()
+
 # --- Sidebar: Global Settings ---
 st.sidebar.header("Global Settings")
-if 'processor' not in st.session_state:
-    st.session_state.processor = DataProcessor(DATA_PATH)
-    st.session_state.raw_df = st.session_state.processor.load_csvs()
+if 'raw_df' not in st.session_state:
+    st.session_state.raw_df = registry.raw_df
+sources = sorted(st.session_state.raw_df['source'].unique()) if 'source' in st.session_state.raw_df else []
+source_filter = st.sidebar.selectbox("Source", ["All"] + sources, help="Pre-filters every retriever to chunks from this newspaper.")
 
 # --- Tabs: Interactive Labs ---
 tab1, tab2, tab3, tab4 = st.tabs(["📦 Data & Chunking", "🔍 Retrieval Lab", "🎯 Advanced Retrieval", "🤖 Generation Lab"])
@@ -35,17 +46,27 @@ with tab1:
         
     if st.button("Process & Chunk"):
         with st.spinner("Processing..."):
-            st.session_state.chunks = st.session_state.processor.chunk_documents(
-                st.session_state.raw_df, strategy=chunk_strategy, chunk_size=chunk_size, overlap=overlap
-            )
-            st.success(f"Created {len(st.session_state.chunks)} chunks!")
-            st.session_state.retriever_bm25 = BM25Retriever(st.session_state.chunks)
-            st.session_state.retriever_vector = VectorRetriever(st.session_state.chunks)
-            st.session_state.hybrid = HybridRetriever(st.session_state.retriever_bm25, st.session_state.retriever_vector)
+            key = registry.make_key(chunk_strategy, chunk_size, overlap)
+            try:
+                # The lease lives in session_state, so the entry is released when the session ends
+                # or when it is replaced here by a new one.
+                st.session_state.registry_lease = registry.lease(key)
+            except RegistryFullError as e:
+                st.error(str(e))
+            else:
+                retrievers = st.session_state.registry_lease.retrievers
+                st.session_state.chunks = retrievers.chunks
+                st.success(f"Created {len(st.session_state.chunks)} chunks!")
+                st.session_state.retriever_bm25 = retrievers.bm25
+                st.session_state.retriever_vector = retrievers.vector
+                st.session_state.hybrid = retrievers.hybrid
 
     if 'chunks' in st.session_state:
         st.subheader("Sample Chunks")
-        st.write(st.session_state.chunks[:3])
+        st.write([chunk.to_dict() for chunk in st.session_state.chunks[:3]])
+
+# Chunks of the selected source as a pre-filter mask; every retriever applies it before scoring
+allowed = st.session_state.chunks.filter_mask(source=source_filter) if 'chunks' in st.session_state else None
 
 with tab2:
     st.header("2. Retrieval Lab")
@@ -56,19 +77,19 @@ with tab2:
         
         with col1:
             st.subheader("BM25 (Keyword)")
-            bm25_res = st.session_state.retriever_bm25.search(query)
+            bm25_res = st.session_state.retriever_bm25.search(query, allowed=allowed)
             for chunk, score in bm25_res:
                 st.info(f"**Score: {score:.2f}**\n\n{chunk['text'][:200]}...")
         
         with col2:
             st.subheader("Vector (Semantic)")
-            vec_res = st.session_state.retriever_vector.search(query)
+            vec_res = st.session_state.retriever_vector.search(query, allowed=allowed)
             for chunk, score in vec_res:
                 st.success(f"**Score: {score:.4f}**\n\n{chunk['text'][:200]}...")
                 
         with col3:
             st.subheader("Hybrid (RRF)")
-            hyb_res = st.session_state.hybrid.search_rrf(query)
+            hyb_res = st.session_state.hybrid.search_rrf(query, allowed=allowed)
             for chunk, score in hyb_res:
                 st.warning(f"**Score: {score:.4f}**\n\n{chunk['text'][:200]}...")
 
@@ -83,9 +104,17 @@ with tab3:
         use_reranker = st.checkbox("Use LLM Reranker")
     
     if st.button("Run Advanced Search"):
-        # Update BM25 with new params
-        temp_bm25 = BM25Retriever(st.session_state.chunks, k1=k1, b=b)
-        results = temp_bm25.search(query)
+        # Update BM25 with new params (shared with other sessions using the same settings).
+        # The session keeps its lease, so re-running with the same k1/b does not rebuild BM25.
+        strategy, size, ov = st.session_state.registry_lease.key[:3]
+        tuned_key = registry.make_key(strategy, size, ov, k1=k1, b=b)
+        if st.session_state.get('tuned_lease') is None or st.session_state.tuned_lease.key != tuned_key:
+            try:
+                st.session_state.tuned_lease = registry.lease(tuned_key)
+            except RegistryFullError as e:
+                st.error(str(e))
+                st.stop()
+        results = st.session_state.tuned_lease.retrievers.bm25.search(query, allowed=allowed)
         
         if use_reranker:
             st.info("Reranking top 5 results using Gemini...")
@@ -105,15 +134,27 @@ with tab4:
     with col1:
         temp = st.slider("Temperature", 0.0, 1.5, DEFAULT_TEMPERATURE)
         top_p = st.slider("Top-P", 0.0, 1.0, DEFAULT_TOP_P)
+    with col2:
+        budget_seconds = st.slider("Latency Budget (s)", 3.0, 30.0, DEFAULT_LATENCY_BUDGET_SECONDS,
+                                   help="The pipeline drops reranking, context or the answer itself to stay within this budget.")
+        rerank_answer = st.checkbox("Rerank context with LLM")
     
     if st.button("Generate RAG Answer"):
-        generator = Generator()
         # Using hybrid results for the final answer
-        context = st.session_state.hybrid.search_rrf(query, top_k=3)
-        answer = generator.generate_answer(query, [c for c, s in context], temperature=temp, top_p=top_p)
+        response = answer_with_budget(
+            query, st.session_state.hybrid, Generator(), RequestBudget(budget_seconds),
+            reranker=Reranker() if rerank_answer else None, temperature=temp, top_p=top_p, allowed=allowed
+        )
+        context = response["context"]
         
         st.subheader("RAG Answer")
-        st.markdown(answer)
+        if response["answer"] is not None:
+            st.markdown(response["answer"])
+        else:
+            st.warning("No answer could be generated within the latency budget. Showing the retrieved sources instead.")
+        st.caption(f"Took {response['elapsed']:.1f}s" + (
+            f" | Degradations: {', '.join(response['degradations'])}" if response["degradations"] else ""
+        ))
         
         with st.expander("Show Context Chunks Used"):
             for c, s in context:
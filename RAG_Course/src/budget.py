@@ -0,0 +1,40 @@
+import math
+import time
+from typing import List, Optional
+
+class RequestBudget:
+    """
+    Deadline for one Generation Lab request. answer_with_budget, the Reranker and the Generator
+    check `allows()` against the BUDGET_* thresholds in config.py before each stage, pass
+    `timeout()` to Gemini, and note every fallback in `degradations` for the UI caption.
+    """
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.deadline = None if seconds is None else self.started + seconds
+        self.degradations: List[str] = []
+
+    def remaining(self) -> float:
+        if self.deadline is None:
+            return math.inf
+        return max(0.0, self.deadline - time.monotonic())
+
+    def allows(self, seconds: float) -> bool:
+        """True if at least `seconds` of the budget are left."""
+        return self.remaining() >= seconds
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, reserve: float = 0.0) -> Optional[float]:
+        """Timeout for a blocking call that must leave `reserve` seconds for later stages; None if unbounded."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.remaining() - reserve)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def degrade(self, name: str) -> None:
+        if name not in self.degradations:
+            self.degradations.append(name)
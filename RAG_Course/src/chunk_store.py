@@ -0,0 +1,142 @@
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Union
+import numpy as np
+
+class ChunkView(Mapping):
+    """
+    Lightweight read-only view of one chunk. Behaves like the old chunk dicts
+    (`chunk['text']`, `chunk['metadata']`) but the text is sliced from the shared blob on access.
+    """
+    __slots__ = ("_store", "chunk_id")
+
+    def __init__(self, store: "ChunkStore", chunk_id: int):
+        self._store = store
+        self.chunk_id = chunk_id
+
+    @property
+    def parent_id(self) -> int:
+        return int(self._store.parents[self.chunk_id])
+
+    def __getitem__(self, key: str):
+        if key == "text":
+            return self._store.text(self.chunk_id)
+        if key == "metadata":
+            return self._store.metadata(self.chunk_id)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(("text", "metadata"))
+
+    def __len__(self) -> int:
+        return 2
+
+    def to_dict(self) -> Dict:
+        return {"text": self["text"], "metadata": self["metadata"]}
+
+    def __repr__(self) -> str:
+        return f"ChunkView({self.to_dict()!r})"
+
+class ChunkStore:
+    """
+    Columnar chunk storage shared by all retrievers.
+    Article texts are stored once in a single string blob; chunks are (parent article, start, end)
+    offsets into it held in numpy arrays, and article metadata is kept once per article.
+    Overlapping fixed-size chunks therefore cost a few integers each instead of copied strings and dicts.
+    """
+    def __init__(self, blob: str, article_offsets: np.ndarray, articles: List[Dict],
+                 parents: np.ndarray, starts: np.ndarray, ends: np.ndarray, with_chunk_ids: bool = False):
+        self.blob = blob
+        self.article_offsets = article_offsets  # int64, start of each article in the blob
+        self.articles = articles                # metadata dict per article
+        self.parents = parents                  # int32, article of each chunk
+        self.starts = starts                    # int32, chunk start relative to its article
+        self.ends = ends                        # int32, chunk end relative to its article
+        self.with_chunk_ids = with_chunk_ids    # fixed-size chunks expose their offset as 'chunk_id'
+        self._facets: Dict[str, Dict[str, np.ndarray]] = {}  # field -> value -> bitmap over articles
+
+    @classmethod
+    def build(cls, texts: List[str], articles: List[Dict], spans: List[List[tuple]],
+              with_chunk_ids: bool = False) -> "ChunkStore":
+        """Builds a store from article texts, their metadata and per-article (start, end) chunk spans."""
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(t) for t in texts])
+        parents, starts, ends = array("i"), array("i"), array("i")
+        for article_id, article_spans in enumerate(spans):
+            for start, end in article_spans:
+                parents.append(article_id)
+                starts.append(start)
+                ends.append(end)
+        return cls(
+            "".join(texts), offsets, articles,
+            np.frombuffer(parents, dtype=np.int32), np.frombuffer(starts, dtype=np.int32),
+            np.frombuffer(ends, dtype=np.int32), with_chunk_ids
+        )
+
+    @classmethod
+    def from_dicts(cls, chunks: List[Dict]) -> "ChunkStore":
+        """Wraps a list of {'text', 'metadata'} chunk dicts, treating each chunk as its own article."""
+        texts = [c["text"] for c in chunks]
+        return cls.build(texts, [c["metadata"] for c in chunks], [[(0, len(t))] for t in texts])
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def __getitem__(self, key: Union[int, slice]):
+        if isinstance(key, slice):
+            return [ChunkView(self, i) for i in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        return ChunkView(self, int(key))
+
+    def __iter__(self) -> Iterator[ChunkView]:
+        for i in range(len(self)):
+            yield ChunkView(self, i)
+
+    def text(self, chunk_id: int) -> str:
+        base = self.article_offsets[self.parents[chunk_id]]
+        return self.blob[base + self.starts[chunk_id]:base + self.ends[chunk_id]]
+
+    def texts(self) -> Iterator[str]:
+        """Yields chunk texts one at a time, so callers never need a second list of all strings."""
+        for i in range(len(self)):
+            yield self.text(i)
+
+    def facet_values(self, field: str) -> List[str]:
+        return sorted(self._facet(field).keys())
+
+    def filter_mask(self, **facets) -> Optional[np.ndarray]:
+        """
+        Boolean mask over chunks whose article matches every facet, for the retrievers' `allowed` pre-filter.
+        Each facet is a value or a list of accepted values; None or "All" leaves it unfiltered.
+        Returns None when no facet is active.
+        """
+        article_mask = None
+        for field, accepted in facets.items():
+            if accepted is None or accepted == "All":
+                continue
+            bitmaps = self._facet(field)
+            values = accepted if isinstance(accepted, (list, tuple, set)) else [accepted]
+            field_mask = np.zeros(len(self.articles), dtype=bool)
+            for value in values:
+                if str(value) in bitmaps:
+                    field_mask |= bitmaps[str(value)]
+            article_mask = field_mask if article_mask is None else article_mask & field_mask
+        if article_mask is None:
+            return None
+        return article_mask[self.parents]
+
+    def _facet(self, field: str) -> Dict[str, np.ndarray]:
+        # Built on first use; article metadata never changes, so a concurrent rebuild gives the same result.
+        if field not in self._facets:
+            values = np.array([str(a.get(field, "")) for a in self.articles], dtype=object)
+            self._facets[field] = {value: values == value for value in np.unique(values)} if len(values) else {}
+        return self._facets[field]
+
+    def metadata(self, chunk_id: int) -> Dict:
+        article = self.articles[self.parents[chunk_id]]
+        if self.with_chunk_ids:
+            return {**article, "chunk_id": int(self.starts[chunk_id])}
+        return article
@@ -5,6 +5,8 @@ load_dotenv()
 
 # Model Configurations
 EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+QUERY_ENCODER_BACKEND = "float"  # "float" or "int8" (dynamic quantization, CPU); documents are always float
+ENCODER_NUM_THREADS = None  # torch intra-op threads for query encoding; None keeps torch's default
 GEMINI_MODEL_NAME = "gemini-1.5-flash"
 
 # Default Parameters
@@ -14,6 +16,18 @@ DEFAULT_ALPHA = 0.5  # Hybrid search weight (1 = Vector, 0 = Keyword)
 DEFAULT_TOP_K = 5
 DEFAULT_RRF_K = 60
 
+# Shared Retriever Registry
+DEFAULT_REGISTRY_MAX_ENTRIES = 4  # Unreferenced retriever sets kept warm for reuse across sessions
+DEFAULT_REGISTRY_HARD_MAX_ENTRIES = 8  # Total retriever sets, in use or not; new settings are refused beyond this
+DEFAULT_RESULT_CACHE_SIZE = 1024  # Cached (query, filters, top_k) results per retriever
+
+# Latency Budget Policies (seconds of budget that must remain for each stage)
+DEFAULT_LATENCY_BUDGET_SECONDS = 15.0
+BUDGET_HYBRID_SECONDS = 1.0          # Extra time hybrid retrieval needs over BM25 alone
+BUDGET_MIN_RERANK_SECONDS = 8.0      # Below this, skip LLM reranking
+BUDGET_SHRINK_CONTEXT_SECONDS = 5.0  # Below this, send only half of the context chunks
+BUDGET_MIN_GENERATION_SECONDS = 2.0  # Below this, return the sources without an answer
+
 # LLM Sampling Defaults
 DEFAULT_TEMPERATURE = 0.7
 DEFAULT_TOP_P = 0.95
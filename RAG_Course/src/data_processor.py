@@ -2,7 +2,7 @@ import os
 import pandas as pd
 import glob
 import re
-from typing import List, Dict
+from .chunk_store import ChunkStore
 
 class DataProcessor:
     def __init__(self, data_path: str):
@@ -16,10 +16,12 @@ class DataProcessor:
             try:
                 df = pd.read_csv(filename)
                 # Extract source from filename (e.g., 'The News' or 'Express Tribune')
+                # Files are named {newspaper}_{YYYYMMDD}.csv, e.g. the_news_20250601.csv
+                basename = os.path.basename(filename).lower()
                 source = "Unknown"
-                if "thenews" in filename.lower():
+                if basename.startswith(("the_news_", "thenews")):
                     source = "The News"
-                elif "tribune" in filename.lower():
+                elif basename.startswith("tribune"):
                     source = "The Express Tribune"
                 
                 df['source'] = source
@@ -32,43 +34,42 @@ class DataProcessor:
             
         return pd.concat(df_list, ignore_index=True)
 
-    def chunk_documents(self, df: pd.DataFrame, strategy: str = "document", chunk_size: int = 500, overlap: int = 50) -> List[Dict]:
+    def chunk_documents(self, df: pd.DataFrame, strategy: str = "document", chunk_size: int = 500, overlap: int = 50) -> ChunkStore:
         """
         Chunks documents based on selected strategy.
         Strategies: 'document' (one chunk per article), 'fixed' (fixed character size).
+        Returns a ChunkStore: each article's text and metadata are stored once and chunks are offsets into them.
         """
-        chunks = []
+        texts, articles, spans = [], [], []
         for idx, row in df.iterrows():
             title = str(row.get('title', ''))
             content = str(row.get('content', ''))
             full_text = f"Title: {title}\n\nContent: {content}"
-            metadata = {
+            texts.append(full_text)
+            articles.append({
                 "source": row.get('source', 'Unknown'),
                 "index": idx,
                 "title": title
-            }
+            })
 
             if strategy == "document":
-                chunks.append({
-                    "text": full_text,
-                    "metadata": metadata
-                })
+                spans.append([(0, len(full_text))])
             elif strategy == "fixed":
                 # Simple fixed-size character chunking
+                article_spans = []
                 start = 0
                 while start < len(full_text):
-                    end = start + chunk_size
-                    chunk_text = full_text[start:end]
-                    chunks.append({
-                        "text": chunk_text,
-                        "metadata": {**metadata, "chunk_id": start}
-                    })
-                    start += (chunk_size - overlap)
+                    article_spans.append((start, min(start + chunk_size, len(full_text))))
+                    start += max(1, chunk_size - overlap)
+                spans.append(article_spans)
+            else:
+                spans.append([])
         
-        return chunks
+        return ChunkStore.build(texts, articles, spans, with_chunk_ids=(strategy == "fixed"))
 
 if __name__ == "__main__":
-    from config import DATA_PATH
+    # Run as: python -m src.data_processor
+    from .config import DATA_PATH
     processor = DataProcessor(DATA_PATH)
     raw_df = processor.load_csvs()
     print(f"Loaded {len(raw_df)} articles.")
@@ -0,0 +1,45 @@
+import copy
+import numpy as np
+from typing import Dict, List, Optional
+
+ENCODER_BACKENDS = ("float", "int8")
+# Sample queries used to check the fast encoder against the float one
+AGREEMENT_QUERIES = [
+    "What happened with the Indus Water Treaty?",
+    "Who won the PSL final?",
+    "Latest fuel prices in Pakistan",
+    "IMF loan negotiations and the federal budget",
+    "Cricket match in Karachi",
+    "Flood warnings for Punjab and Sindh",
+]
+MIN_AGREEMENT = 0.98
+
+def load_query_model(model, backend: str = "float", num_threads: Optional[int] = None):
+    """
+    Query encoder for VectorRetriever, selected by QUERY_ENCODER_BACKEND.
+    "float" is the shared embedding model itself; "int8" is a dynamically quantized CPU copy of it
+    whose query vectors still match the float chunk vectors in FAISS (checked with encoder_agreement).
+    `num_threads` (ENCODER_NUM_THREADS) sets torch intra-op threads.
+    """
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend: {backend}. Choose from {ENCODER_BACKENDS}.")
+
+    if num_threads:
+        import torch
+        torch.set_num_threads(num_threads)
+    if backend == "float":
+        return model
+
+    import torch
+    # Quantize a CPU copy so the float model used for documents is left untouched
+    cpu_copy = copy.deepcopy(model).to("cpu")
+    return torch.quantization.quantize_dynamic(cpu_copy, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+def encoder_agreement(reference_model, query_model, texts: List[str] = AGREEMENT_QUERIES) -> Dict[str, float]:
+    """Cosine similarity between the two models' embeddings of `texts`: {'mean': ..., 'min': ...}."""
+    reference = np.asarray(reference_model.encode(list(texts), show_progress_bar=False), dtype='float32')
+    fast = np.asarray(query_model.encode(list(texts), show_progress_bar=False), dtype='float32')
+    cosines = (reference * fast).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(fast, axis=1) + 1e-12
+    )
+    return {"mean": float(cosines.mean()), "min": float(cosines.min())}
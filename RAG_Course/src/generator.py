@@ -1,5 +1,6 @@
 import google.generativeai as genai
-from typing import List, Dict
+from typing import List, Dict, Optional
+from .budget import RequestBudget
 from .config import GOOGLE_API_KEY, GEMINI_MODEL_NAME, DEFAULT_TEMPERATURE, DEFAULT_TOP_P, DEFAULT_TOP_K_SAMPLING, DEFAULT_MAX_OUTPUT_TOKENS
 
 class Generator:
@@ -12,9 +13,11 @@ class Generator:
                         temperature: float = DEFAULT_TEMPERATURE,
                         top_p: float = DEFAULT_TOP_P,
                         top_k: int = DEFAULT_TOP_K_SAMPLING,
-                        system_prompt: str = None) -> str:
+                        system_prompt: str = None,
+                        budget: Optional[RequestBudget] = None) -> Optional[str]:
         """
         Generates a RAG-enhanced answer using Gemini with tunable sampling parameters.
+        With a `budget`, the LLM call times out at the deadline and None is returned.
         """
         context_text = "\n\n---\n\n".join([c['text'] for c in context_chunks])
         
@@ -44,6 +47,17 @@ class Generator:
         }
 
         model = genai.GenerativeModel(GEMINI_MODEL_NAME)
-        response = model.generate_content(full_prompt, generation_config=generation_config)
+        timeout = budget.timeout() if budget else None
+        try:
+            response = model.generate_content(
+                full_prompt,
+                generation_config=generation_config,
+                request_options={"timeout": timeout} if timeout is not None else None
+            )
+        except Exception:
+            if budget is not None and budget.expired():
+                budget.degrade("generation_timeout")
+                return None
+            raise
         
         return response.text
@@ -0,0 +1,57 @@
+from typing import Dict, Optional
+import numpy as np
+from .budget import RequestBudget
+from .config import (DEFAULT_TEMPERATURE, DEFAULT_TOP_P, BUDGET_HYBRID_SECONDS, BUDGET_MIN_RERANK_SECONDS,
+                     BUDGET_SHRINK_CONTEXT_SECONDS, BUDGET_MIN_GENERATION_SECONDS)
+from .generator import Generator
+from .reranker import Reranker
+from .retrievers import HybridRetriever
+
+def answer_with_budget(query: str,
+                       hybrid: HybridRetriever,
+                       generator: Generator,
+                       budget: RequestBudget,
+                       reranker: Optional[Reranker] = None,
+                       top_k: int = 3,
+                       temperature: float = DEFAULT_TEMPERATURE,
+                       top_p: float = DEFAULT_TOP_P,
+                       allowed: Optional[np.ndarray] = None) -> Dict:
+    """
+    Runs retrieval, optional reranking and generation under one latency budget.
+    When time runs low the pipeline degrades instead of overrunning: BM25-only retrieval,
+    no LLM reranking, a smaller context, or sources without an answer.
+    `allowed` is an optional boolean mask over chunks (see ChunkStore.filter_mask) that restricts retrieval.
+    Returns the answer (None if dropped), the context used, the degradations and the elapsed time.
+    """
+    # 1. Retrieval: hybrid only if it still leaves the later stages the time they need
+    reserve = BUDGET_MIN_RERANK_SECONDS if reranker is not None else BUDGET_MIN_GENERATION_SECONDS
+    if budget.allows(BUDGET_HYBRID_SECONDS + reserve):
+        results = hybrid.search_rrf(query, top_k=top_k, allowed=allowed)
+    else:
+        budget.degrade("bm25_only")
+        results = hybrid.bm25.search(query, top_k=top_k, allowed=allowed)
+
+    # 2. Reranking
+    if reranker is not None:
+        results = reranker.rerank_with_llm(query, results, budget=budget)
+
+    # 3. Context
+    if not budget.allows(BUDGET_SHRINK_CONTEXT_SECONDS) and len(results) > 1:
+        budget.degrade("shrunk_context")
+        results = results[:max(1, len(results) // 2)]
+
+    # 4. Generation
+    answer = None
+    if budget.allows(BUDGET_MIN_GENERATION_SECONDS):
+        answer = generator.generate_answer(
+            query, [c for c, s in results], temperature=temperature, top_p=top_p, budget=budget
+        )
+    else:
+        budget.degrade("sources_only")
+
+    return {
+        "answer": answer,
+        "context": results,
+        "degradations": list(budget.degradations),
+        "elapsed": budget.elapsed(),
+    }
@@ -0,0 +1,172 @@
+import threading
+import weakref
+from collections import OrderedDict, deque
+from typing import Dict, Tuple
+import pandas as pd
+from .config import (
+    EMBEDDING_MODEL_NAME, DEFAULT_BM25_K1, DEFAULT_BM25_B,
+    DEFAULT_REGISTRY_MAX_ENTRIES, DEFAULT_REGISTRY_HARD_MAX_ENTRIES
+)
+from .data_processor import DataProcessor
+from .chunk_store import ChunkStore
+from .retrievers import BM25Retriever, VectorRetriever, HybridRetriever
+
+RegistryKey = Tuple[str, int, int, float, float, str]
+
+class RetrieverSet:
+    """Read-only bundle of chunks and the retrievers built on top of them."""
+    def __init__(self, key: RegistryKey, chunks: ChunkStore, bm25: BM25Retriever,
+                 vector: VectorRetriever, hybrid: HybridRetriever):
+        self.key = key
+        self.chunks = chunks
+        self.bm25 = bm25
+        self.vector = vector
+        self.hybrid = hybrid
+
+class RegistryFullError(RuntimeError):
+    """Raised when a new retriever set is requested while the registry is at its hard limit."""
+
+class RegistryLease:
+    """
+    A session's reference to one registry entry.
+    The reference is released when `release()` is called or when the lease is garbage collected,
+    so keeping the lease in `st.session_state` ties it to the lifetime of the Streamlit session.
+    """
+    def __init__(self, registry: "RetrieverRegistry", key: RegistryKey, retrievers: RetrieverSet):
+        self.key = key
+        self.retrievers = retrievers
+        self._finalizer = weakref.finalize(self, registry._release_later, key)
+
+    def release(self) -> None:
+        # finalize runs at most once, so an explicit release and garbage collection never double-release
+        self._finalizer()
+
+class _Entry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.retrievers = None
+        self.refcount = 0
+
+class RetrieverRegistry:
+    """
+    Process-wide cache of retrievers shared by all Streamlit sessions.
+    Entries are keyed by chunking and BM25 parameters plus the embedding model,
+    reference counted while sessions use them, and evicted LRU once unreferenced.
+    At most `max_entries` entries are kept in total unless more are in use; `hard_max_entries`
+    bounds all entries, and requests for new settings beyond it raise RegistryFullError.
+    """
+    def __init__(self, processor: DataProcessor, raw_df: pd.DataFrame,
+                 max_entries: int = DEFAULT_REGISTRY_MAX_ENTRIES,
+                 hard_max_entries: int = DEFAULT_REGISTRY_HARD_MAX_ENTRIES):
+        self.processor = processor
+        self.raw_df = raw_df
+        self.max_entries = max_entries
+        self.hard_max_entries = max(hard_max_entries, max_entries)
+        self._entries: "OrderedDict[RegistryKey, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Releases from garbage-collected leases; the collector can run while `_lock` is held,
+        # so they are queued here and applied on the next registry call.
+        self._pending_releases: deque = deque()
+
+    @staticmethod
+    def make_key(strategy: str = "document", chunk_size: int = 500, overlap: int = 0,
+                 k1: float = DEFAULT_BM25_K1, b: float = DEFAULT_BM25_B,
+                 model_name: str = EMBEDDING_MODEL_NAME) -> RegistryKey:
+        # Size and overlap do not affect document-level chunking, so they must not split the cache.
+        if strategy == "document":
+            chunk_size, overlap = 0, 0
+        return (strategy, int(chunk_size), int(overlap), round(float(k1), 4), round(float(b), 4), model_name)
+
+    def acquire(self, key: RegistryKey) -> RetrieverSet:
+        """Returns the retrievers for `key`, building them on first use. Pair with `release`, or use `lease`."""
+        self._apply_pending_releases()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                # Make room among unreferenced entries before refusing a new one
+                self._evict_locked(self.hard_max_entries - 1)
+                if len(self._entries) >= self.hard_max_entries:
+                    raise RegistryFullError(
+                        f"{len(self._entries)} retriever sets are in use; reuse existing settings or try again later."
+                    )
+                entry = _Entry()
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            entry.refcount += 1
+
+        # Build outside the registry lock so sessions asking for other keys are not blocked.
+        try:
+            with entry.lock:
+                if entry.retrievers is None:
+                    entry.retrievers = self._build(key)
+        except Exception:
+            self.release(key)
+            raise
+
+        self._evict()
+        return entry.retrievers
+
+    def lease(self, key: RegistryKey) -> RegistryLease:
+        """Acquires `key` and returns a lease that releases it when dropped."""
+        return RegistryLease(self, key, self.acquire(key))
+
+    def release(self, key: RegistryKey) -> None:
+        self._pending_releases.append(key)
+        self._apply_pending_releases()
+
+    def _release_later(self, key: RegistryKey) -> None:
+        self._pending_releases.append(key)
+
+    def _apply_pending_releases(self) -> None:
+        with self._lock:
+            while self._pending_releases:
+                entry = self._entries.get(self._pending_releases.popleft())
+                if entry is not None and entry.refcount > 0:
+                    entry.refcount -= 1
+            self._evict_locked(self.max_entries)
+
+    def stats(self) -> Dict[str, int]:
+        self._apply_pending_releases()
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "in_use": sum(1 for e in self._entries.values() if e.refcount > 0),
+                "max_entries": self.max_entries,
+                "hard_max_entries": self.hard_max_entries,
+            }
+
+    def _evict(self) -> None:
+        with self._lock:
+            self._evict_locked(self.max_entries)
+
+    def _evict_locked(self, limit: int) -> None:
+        """Drops least recently used unreferenced entries until at most `limit` remain. Caller holds `_lock`."""
+        excess = len(self._entries) - limit
+        for key in list(self._entries.keys()):
+            if excess <= 0:
+                break
+            if self._entries[key].refcount == 0:
+                del self._entries[key]
+                excess -= 1
+
+    def _find_shared(self, key: RegistryKey):
+        """Finds a built entry with the same chunking and model, whose chunks and vectors can be reused."""
+        strategy, chunk_size, overlap, _, _, model_name = key
+        with self._lock:
+            for other_key, entry in self._entries.items():
+                if other_key == key or entry.retrievers is None:
+                    continue
+                if (other_key[0], other_key[1], other_key[2], other_key[5]) == (strategy, chunk_size, overlap, model_name):
+                    return entry.retrievers
+        return None
+
+    def _build(self, key: RegistryKey) -> RetrieverSet:
+        strategy, chunk_size, overlap, k1, b, model_name = key
+        shared = self._find_shared(key)
+        if shared is not None:
+            chunks, vector = shared.chunks, shared.vector
+        else:
+            chunks = self.processor.chunk_documents(self.raw_df, strategy=strategy, chunk_size=chunk_size, overlap=overlap)
+            vector = VectorRetriever(chunks, model_name=model_name)
+        bm25 = BM25Retriever(chunks, k1=k1, b=b)
+        return RetrieverSet(key, chunks, bm25, vector, HybridRetriever(bm25, vector))
@@ -1,19 +1,32 @@
 import google.generativeai as genai
-from typing import List, Dict, Tuple
-from .config import GOOGLE_API_KEY, GEMINI_MODEL_NAME
+from typing import List, Dict, Tuple, Optional
+from .budget import RequestBudget
+from .config import GOOGLE_API_KEY, GEMINI_MODEL_NAME, BUDGET_MIN_RERANK_SECONDS, BUDGET_MIN_GENERATION_SECONDS
 
 class Reranker:
     def __init__(self):
         genai.configure(api_key=GOOGLE_API_KEY)
         self.model = genai.GenerativeModel(GEMINI_MODEL_NAME)
 
-    def rerank_with_llm(self, query: str, results: List[Tuple[Dict, float]]) -> List[Tuple[Dict, float]]:
+    def rerank_with_llm(self, query: str, results: List[Tuple[Dict, float]],
+                        budget: Optional[RequestBudget] = None) -> List[Tuple[Dict, float]]:
         """
         Uses LLM to score the relevance of retrieved documents.
         This demonstrates the 'LLM-as-a-judge' and reranking concepts from Lecture 3.
+        With a `budget`, reranking is skipped when time is short and abandoned (keeping
+        the original order) if it would eat into the time reserved for generation.
         """
+        budget = budget or RequestBudget()
+        if not budget.allows(BUDGET_MIN_RERANK_SECONDS):
+            budget.degrade("skipped_llm_rerank")
+            return results
+
         reranked_results = []
         for chunk, initial_score in results:
+            if not budget.allows(BUDGET_MIN_GENERATION_SECONDS):
+                # Mixing LLM and retrieval scores would be meaningless, so fall back to the retrieval ranking
+                budget.degrade("aborted_llm_rerank")
+                return results
             prompt = f"""
             Score the relevance of the following news snippet to the user query.
             Query: {query}
@@ -22,10 +35,18 @@ class Reranker:
             Return ONLY a single number between 0 and 1, where 1 is highly relevant and 0 is not relevant at all.
             """
             try:
-                response = self.model.generate_content(prompt)
+                timeout = budget.timeout(reserve=BUDGET_MIN_GENERATION_SECONDS)
+                request_options = {"timeout": timeout} if timeout is not None else None
+                response = self.model.generate_content(prompt, request_options=request_options)
                 llm_score = float(response.text.strip())
                 reranked_results.append((chunk, llm_score))
-            except:
+            except Exception:
+                # A timed-out call ends exactly at the generation reserve, hence <= rather than allows()
+                if budget.remaining() <= BUDGET_MIN_GENERATION_SECONDS:
+                    # The call ran into the time reserved for generation (usually a timeout);
+                    # as above, keep the retrieval ranking rather than mixing the two kinds of score.
+                    budget.degrade("aborted_llm_rerank")
+                    return results
                 # Fallback to initial score if LLM scoring fails
                 reranked_results.append((chunk, initial_score))
         
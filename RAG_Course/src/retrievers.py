@@ -1,77 +1,173 @@
+import hashlib
+import itertools
+import threading
 import numpy as np
 import faiss
 from rank_bm25 import BM25Okapi
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Tuple
-from .config import EMBEDDING_MODEL_NAME, DEFAULT_BM25_K1, DEFAULT_BM25_B, DEFAULT_RRF_K
+from typing import List, Dict, Tuple, Optional, Sequence, Union
+from .config import (EMBEDDING_MODEL_NAME, DEFAULT_BM25_K1, DEFAULT_BM25_B, DEFAULT_RRF_K,
+                     QUERY_ENCODER_BACKEND, ENCODER_NUM_THREADS)
+from .encoders import load_query_model, encoder_agreement, MIN_AGREEMENT
+from .result_cache import ResultCache
+from .chunk_store import ChunkStore, ChunkView
+
+_MODEL_CACHE: Dict[str, SentenceTransformer] = {}
+_QUERY_MODEL_CACHE: Dict[Tuple[str, str], SentenceTransformer] = {}
+_MODEL_LOCK = threading.Lock()
+ENCODE_BATCH_SIZE = 1024  # Chunks encoded per call while building the vector index
+
+def get_embedding_model(model_name: str = EMBEDDING_MODEL_NAME) -> SentenceTransformer:
+    """Returns a process-wide SentenceTransformer so every retriever shares one copy of the weights."""
+    with _MODEL_LOCK:
+        if model_name not in _MODEL_CACHE:
+            _MODEL_CACHE[model_name] = SentenceTransformer(model_name)
+        return _MODEL_CACHE[model_name]
+
+def get_query_model(model_name: str = EMBEDDING_MODEL_NAME, backend: str = QUERY_ENCODER_BACKEND):
+    """
+    Returns the process-wide query encoder for `backend`. A quantized encoder whose embeddings
+    drift from the float document encoder is replaced by the float one.
+    """
+    model = get_embedding_model(model_name)
+    with _MODEL_LOCK:
+        key = (model_name, backend)
+        if key not in _QUERY_MODEL_CACHE:
+            query_model = load_query_model(model, backend, ENCODER_NUM_THREADS)
+            if query_model is not model:
+                agreement = encoder_agreement(model, query_model)
+                print(f"Query encoder '{backend}': cosine agreement with float mean={agreement['mean']:.4f} "
+                      f"min={agreement['min']:.4f}")
+                if agreement["min"] < MIN_AGREEMENT:
+                    print(f"Agreement below {MIN_AGREEMENT}; using the float query encoder instead.")
+                    query_model = model
+            _QUERY_MODEL_CACHE[key] = query_model
+        return _QUERY_MODEL_CACHE[key]
 
 class BaseRetriever:
-    def __init__(self, chunks: List[Dict]):
-        self.chunks = chunks
-        self.corpus = [c['text'] for c in chunks]
+    """
+    Retrievers are read-only once built, so each one owns a result cache
+    that is shared by every session using it.
+    """
+    def __init__(self, chunks: Union[ChunkStore, List[Dict]]):
+        # Retrievers built on the same ChunkStore share its text and metadata instead of copying them
+        self.chunks = chunks if isinstance(chunks, ChunkStore) else ChunkStore.from_dicts(chunks)
+        self.cache = ResultCache()
+
+    def search_ids(self, query: str, top_k: int = 5, allowed: Optional[np.ndarray] = None) -> Tuple[Sequence[int], Sequence[float]]:
+        """Returns (chunk positions, scores) for the query, from the cache when possible."""
+        key = self.cache.make_key(query, top_k, allowed=mask_key(allowed))
+        hit = self.cache.get(key)
+        if hit is None:
+            hit = self._search_ids(query, top_k, allowed)
+            self.cache.put(key, *hit)
+        return hit
+
+    def search(self, query: str, top_k: int = 5, allowed: Optional[np.ndarray] = None) -> List[Tuple[ChunkView, float]]:
+        """`allowed` is an optional boolean mask over chunks used as a metadata pre-filter."""
+        ids, scores = self.search_ids(query, top_k, allowed)
+        return [(self.chunks[i], score) for i, score in zip(ids, scores)]
+
+    def _search_ids(self, query: str, top_k: int, allowed: Optional[np.ndarray]) -> Tuple[List[int], List[float]]:
+        raise NotImplementedError
 
 class BM25Retriever(BaseRetriever):
-    def __init__(self, chunks: List[Dict], k1=DEFAULT_BM25_K1, b=DEFAULT_BM25_B):
+    def __init__(self, chunks: Union[ChunkStore, List[Dict]], k1=DEFAULT_BM25_K1, b=DEFAULT_BM25_B):
         super().__init__(chunks)
-        tokenized_corpus = [doc.lower().split() for doc in self.corpus]
+        tokenized_corpus = [text.lower().split() for text in self.chunks.texts()]
         self.bm25 = BM25Okapi(tokenized_corpus, k1=k1, b=b)
 
-    def search(self, query: str, top_k: int = 5) -> List[Tuple[Dict, float]]:
+    def _search_ids(self, query: str, top_k: int, allowed: Optional[np.ndarray]) -> Tuple[List[int], List[float]]:
         tokenized_query = query.lower().split()
         scores = self.bm25.get_scores(tokenized_query)
-        top_indices = np.argsort(scores)[::-1][:top_k]
-        return [(self.chunks[i], float(scores[i])) for i in top_indices]
+        if allowed is not None:
+            candidates = np.flatnonzero(allowed)
+            top_indices = candidates[np.argsort(scores[candidates])[::-1][:top_k]]
+        else:
+            top_indices = np.argsort(scores)[::-1][:top_k]
+        return top_indices.tolist(), [float(scores[i]) for i in top_indices]
 
 class VectorRetriever(BaseRetriever):
-    def __init__(self, chunks: List[Dict], model_name=EMBEDDING_MODEL_NAME):
+    def __init__(self, chunks: Union[ChunkStore, List[Dict]], model_name=EMBEDDING_MODEL_NAME,
+                 query_backend=QUERY_ENCODER_BACKEND):
         super().__init__(chunks)
-        self.model = SentenceTransformer(model_name)
-        self.embeddings = self.model.encode(self.corpus, show_progress_bar=False)
-        self.dimension = self.embeddings.shape[1]
-        
-        # L2 Distance (Euclidean)
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.index.add(self.embeddings.astype('float32'))
+        self.model = get_embedding_model(model_name)
+        self.query_model = get_query_model(model_name, query_backend)
+        self.index = None
+
+        # Encode in batches so only one batch of chunk strings is materialised at a time;
+        # the vectors live in the FAISS index only.
+        texts = self.chunks.texts()
+        while True:
+            batch = list(itertools.islice(texts, ENCODE_BATCH_SIZE))
+            if not batch:
+                break
+            embeddings = np.asarray(self.model.encode(batch, show_progress_bar=False)).astype('float32')
+            if self.index is None:
+                # L2 Distance (Euclidean)
+                self.dimension = embeddings.shape[1]
+                self.index = faiss.IndexFlatL2(self.dimension)
+            self.index.add(embeddings)
+        if self.index is None:
+            self.dimension = self.model.get_sentence_embedding_dimension()
+            self.index = faiss.IndexFlatL2(self.dimension)
 
-    def search(self, query: str, top_k: int = 5) -> List[Tuple[Dict, float]]:
-        query_vector = self.model.encode([query], show_progress_bar=False).astype('float32')
-        distances, indices = self.index.search(query_vector, top_k)
+    def _search_ids(self, query: str, top_k: int, allowed: Optional[np.ndarray]) -> Tuple[List[int], List[float]]:
+        # The mask is applied inside FAISS, so only allowed chunks are scored
+        params = None
+        if allowed is not None:
+            if not allowed.any():
+                return [], []
+            selector = faiss.IDSelectorBitmap(np.packbits(allowed, bitorder='little'))
+            params = faiss.SearchParameters(sel=selector)
+        query_vector = self.query_model.encode([query], show_progress_bar=False).astype('float32')
+        distances, indices = self.index.search(query_vector, top_k, params=params)
         
         # Convert L2 distance to a "similarity" score (1 / (1 + d))
-        results = []
+        ids, scores = [], []
         for d, i in zip(distances[0], indices[0]):
             if i != -1:
-                score = 1 / (1 + d)
-                results.append((self.chunks[i], float(score)))
-        return results
+                ids.append(int(i))
+                scores.append(float(1 / (1 + d)))
+        return ids, scores
 
 class HybridRetriever:
     def __init__(self, bm25_retriever: BM25Retriever, vector_retriever: VectorRetriever):
         self.bm25 = bm25_retriever
         self.vector = vector_retriever
+        self.chunks = vector_retriever.chunks
+        self.cache = ResultCache()
 
-    def search_rrf(self, query: str, top_k: int = 5, k=DEFAULT_RRF_K) -> List[Tuple[Dict, float]]:
+    def search_rrf(self, query: str, top_k: int = 5, k=DEFAULT_RRF_K,
+                   allowed: Optional[np.ndarray] = None) -> List[Tuple[ChunkView, float]]:
         """Reciprocal Rank Fusion (RRF) implementation."""
-        bm25_results = self.bm25.search(query, top_k=50) # Search more to fuse
-        vector_results = self.vector.search(query, top_k=50)
+        key = self.cache.make_key(query, top_k, rrf_k=k, allowed=mask_key(allowed))
+        hit = self.cache.get(key)
+        if hit is None:
+            hit = self._fuse(query, top_k, k, allowed)
+            self.cache.put(key, *hit)
+        ids, scores = hit
+        return [(self.chunks[i], score) for i, score in zip(ids, scores)]
 
-        scores = {} # Map chunk text to performance score
-        
-        # Helper to get unique key for a chunk
-        def get_key(chunk): return chunk['text']
+    def _fuse(self, query: str, top_k: int, k: int, allowed: Optional[np.ndarray]) -> Tuple[List[int], List[float]]:
+        bm25_ids, _ = self.bm25.search_ids(query, top_k=50, allowed=allowed) # Search more to fuse
+        vector_ids, _ = self.vector.search_ids(query, top_k=50, allowed=allowed)
+
+        scores = {} # Map chunk position to performance score
 
         # RRF formula: Score = sum(1 / (k + rank))
-        for rank, (chunk, _) in enumerate(bm25_results, 1):
-            key = get_key(chunk)
-            scores[key] = scores.get(key, 0) + (1.0 / (k + rank))
+        for rank, i in enumerate(bm25_ids, 1):
+            scores[i] = scores.get(i, 0) + (1.0 / (k + rank))
             
-        for rank, (chunk, _) in enumerate(vector_results, 1):
-            key = get_key(chunk)
-            scores[key] = scores.get(key, 0) + (1.0 / (k + rank))
+        for rank, i in enumerate(vector_ids, 1):
+            scores[i] = scores.get(i, 0) + (1.0 / (k + rank))
 
         # Sort by RRF score
         sorted_results = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
-        
-        # Map back to chunk objects
-        text_to_chunk = {chunk['text']: chunk for chunk, score in (bm25_results + vector_results)}
-        return [(text_to_chunk[text], score) for text, score in sorted_results]
+        return [i for i, _ in sorted_results], [score for _, score in sorted_results]
+
+def mask_key(allowed: Optional[np.ndarray]) -> Optional[str]:
+    """Compact, hashable fingerprint of a pre-filter mask for use in cache keys."""
+    if allowed is None:
+        return None
+    return hashlib.sha1(np.packbits(allowed)).hexdigest() + f":{len(allowed)}"
@@ -0,0 +1,135 @@
+import unittest
+from unittest import mock
+
+from src.budget import RequestBudget
+from src.pipeline import answer_with_budget
+from src.reranker import Reranker
+
+class FakeClock:
+    """Replaces time.monotonic in src.budget so tests decide how long each stage takes."""
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+def chunk(i):
+    return {"text": f"Chunk {i}", "metadata": {"source": "The News", "title": f"t{i}"}}
+
+class FakeRetriever:
+    def __init__(self, clock, latency, name, calls):
+        self.clock, self.latency, self.name, self.calls = clock, latency, name, calls
+
+    def search(self, query, top_k=5, allowed=None):
+        self.calls.append(self.name)
+        self.clock.advance(self.latency)
+        return [(chunk(i), 1.0 / (i + 1)) for i in range(top_k)]
+
+class FakeHybrid:
+    def __init__(self, clock, latency=0.0):
+        self.calls = []
+        self.bm25 = FakeRetriever(clock, 0.0, "bm25", self.calls)
+        self._hybrid = FakeRetriever(clock, latency, "hybrid", self.calls)
+
+    def search_rrf(self, query, top_k=5, k=60, allowed=None):
+        return self._hybrid.search(query, top_k, allowed)
+
+class FakeModel:
+    """Gemini stand-in: takes `latency` seconds of fake time or times out past the request timeout."""
+    def __init__(self, clock, latency=0.0, text="0.9"):
+        self.clock, self.latency, self.text = clock, latency, text
+        self.calls = 0
+
+    def generate_content(self, prompt, generation_config=None, request_options=None):
+        self.calls += 1
+        timeout = (request_options or {}).get("timeout")
+        if timeout is not None and self.latency > timeout:
+            self.clock.advance(timeout)
+            raise TimeoutError("Deadline exceeded")
+        self.clock.advance(self.latency)
+        return mock.Mock(text=self.text)
+
+class FakeGenerator:
+    def __init__(self, clock, latency=0.0):
+        self.model = FakeModel(clock, latency, text="answer")
+        self.contexts = []
+
+    def generate_answer(self, query, context_chunks, temperature=0.0, top_p=1.0, budget=None):
+        self.contexts.append(context_chunks)
+        timeout = budget.timeout() if budget else None
+        try:
+            return self.model.generate_content(query, request_options={"timeout": timeout}).text
+        except TimeoutError:
+            budget.degrade("generation_timeout")
+            return None
+
+class AnswerWithBudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("src.budget.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _reranker(self, latency):
+        with mock.patch("src.reranker.genai"):
+            reranker = Reranker()
+        reranker.model = FakeModel(self.clock, latency)
+        return reranker
+
+    def _run(self, budget_seconds, hybrid=0.0, generation=0.0, reranker=None):
+        self.hybrid = FakeHybrid(self.clock, hybrid)
+        self.generator = FakeGenerator(self.clock, generation)
+        return answer_with_budget(
+            "PSL final?", self.hybrid, self.generator, RequestBudget(budget_seconds), reranker=reranker, top_k=4
+        )
+
+    def test_ample_budget_is_not_degraded(self):
+        response = self._run(15, hybrid=0.5, generation=1, reranker=self._reranker(0.1))
+        self.assertEqual(response["answer"], "answer")
+        self.assertEqual(response["degradations"], [])
+        self.assertEqual(self.hybrid.calls, ["hybrid"])
+
+    def test_tight_budget_falls_back_to_bm25(self):
+        response = self._run(2.5, generation=0.1)
+        self.assertEqual(response["degradations"], ["bm25_only", "shrunk_context"])
+        self.assertEqual(self.hybrid.calls, ["bm25"])
+        self.assertEqual(response["answer"], "answer")
+
+    def test_reranker_reserve_counts_towards_hybrid_fallback(self):
+        response = self._run(8.5, reranker=self._reranker(0.1))
+        self.assertEqual(self.hybrid.calls, ["bm25"])
+        self.assertIn("bm25_only", response["degradations"])
+
+    def test_short_budget_skips_rerank(self):
+        reranker = self._reranker(0.1)
+        response = self._run(6, reranker=reranker)
+        self.assertIn("skipped_llm_rerank", response["degradations"])
+        self.assertEqual(reranker.model.calls, 0)
+
+    def test_rerank_timeout_keeps_retrieval_order(self):
+        response = self._run(10, reranker=self._reranker(30))
+        self.assertIn("aborted_llm_rerank", response["degradations"])
+        self.assertEqual([c["text"] for c, _ in response["context"]], ["Chunk 0", "Chunk 1"])
+        self.assertEqual([s for _, s in response["context"]], [1.0, 0.5])
+
+    def test_slow_retrieval_shrinks_context(self):
+        response = self._run(15, hybrid=11)
+        self.assertEqual(response["degradations"], ["shrunk_context"])
+        self.assertEqual(len(self.generator.contexts[0]), 2)
+
+    def test_exhausted_budget_returns_sources_only(self):
+        response = self._run(15, hybrid=14)
+        self.assertIsNone(response["answer"])
+        self.assertEqual(response["degradations"], ["shrunk_context", "sources_only"])
+        self.assertEqual(self.generator.contexts, [])
+
+    def test_generation_timeout(self):
+        response = self._run(15, generation=30)
+        self.assertIsNone(response["answer"])
+        self.assertEqual(response["degradations"], ["generation_timeout"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,9 +6,11 @@ import streamlit as st
 import os
 import pandas as pd
 from datetime import datetime
-from data_loader import load_all_csvs, preprocess_documents
+from data_loader import group_files_by_day, iter_daily_documents
 from vector_store import VectorStore
 from rag_engine import RAGEngine
+from latency_budget import RequestBudget
+from search_service import RAGServiceClient
 
 st.set_page_config(page_title="Pakistani News RAG System", layout="wide")
 
@@ -20,10 +22,17 @@ Compare standard LLM answers with RAG-enhanced answers using local document cont
 
 # --- Sidebar: Configuration & Stats ---
 st.sidebar.header("🛡️ App Settings")
-google_api_key = st.sidebar.text_input("Google API Key", value=os.getenv("GOOGLE_API_KEY", ""), type="password")
+# When RAG_SERVICE_URL is set, retrieval and generation run in the shared search_service.py process,
+# which calls Gemini with its own key
+rag_service_url = os.getenv("RAG_SERVICE_URL")
+if rag_service_url:
+    google_api_key = None
+    st.sidebar.caption(f"Answers come from the RAG service at {rag_service_url}, which uses its own Google API key.")
+else:
+    google_api_key = st.sidebar.text_input("Google API Key", value=os.getenv("GOOGLE_API_KEY", ""), type="password")
 
-if google_api_key:
-    os.environ["GOOGLE_API_KEY"] = google_api_key
+    if google_api_key:
+        os.environ["GOOGLE_API_KEY"] = google_api_key
 
 st.sidebar.divider()
 st.sidebar.header("🧪 Experimentation Dashboard")
@@ -45,36 +54,100 @@ temperature = st.sidebar.slider(
     help="Higher values make the output more creative, lower values more deterministic."
 )
 
-st.sidebar.divider()
-st.sidebar.subheader("🔎 Filters")
-newspaper = st.sidebar.selectbox("Newspaper Source", ["All", "The News", "Tribune"])
+latency_budget = st.sidebar.slider(
+    "Latency Budget (s)",
+    min_value=3.0,
+    max_value=60.0,
+    value=15.0,
+    step=1.0,
+    help="Covers the whole page. Context is reduced, or only sources are shown, when an answer would take "
+         "longer than this; the plain LLM answer gets whatever time is left."
+)
 
 # Initialize Vector Store
 @st.cache_resource
 def get_vector_store():
     vs = VectorStore()
     if not vs.load_index():
-        st.sidebar.warning("Index not found. Building index from CSVs...")
-        df = load_all_csvs()
-        if not df.empty:
-            docs = preprocess_documents(df)
-            vs.build_index(docs)
-            vs.save_index()
-            st.sidebar.success(f"Built index with {len(docs)} documents.")
+        # Build day by day in the background; queries use the partial index until the build completes
+        days = group_files_by_day()
+        if days:
+            vs.build_index_in_background(iter_daily_documents(), total_batches=len(days))
         else:
             st.sidebar.error("No data found in 'data/' folder.")
+    # Pick up rebuilt index versions without restarting the app
+    vs.start_watcher()
     return vs
 
-vs = get_vector_store()
-rag_engine = RAGEngine(vs)
+if rag_service_url:
+    vs = None
+    rag_engine = RAGServiceClient(rag_service_url)
+else:
+    vs = get_vector_store()
+    rag_engine = RAGEngine(vs)
+
+def get_facets(**filters):
+    """Facet counts for the documents matching `filters`, from the local metadata index or the service."""
+    if vs is None:
+        try:
+            return rag_engine.facets(**filters)
+        except Exception:
+            return {"counts": {}, "dates": []}
+    mask = vs.filter_mask(**filters)
+    return {"counts": vs.metadata_index.facet_counts(mask), "dates": vs.metadata_index.unique_dates()}
+
+st.sidebar.divider()
+st.sidebar.subheader("🔎 Filters")
+all_facets = get_facets()
+paper_counts = all_facets["counts"].get("newspaper", {})
+sentiment_counts = all_facets["counts"].get("sentiment", {})
+
+newspaper = st.sidebar.selectbox(
+    "Newspaper Source",
+    ["All"] + sorted(paper_counts) if paper_counts else ["All", "The News", "Tribune"],
+    format_func=lambda v: f"{v} ({paper_counts[v]})" if v in paper_counts else v
+)
+sentiment_filter = st.sidebar.multiselect(
+    "Headline Sentiment",
+    sorted(sentiment_counts),
+    format_func=lambda v: f"{v} ({sentiment_counts[v]})"
+) or None
+
+date_range = None
+dates = all_facets["dates"]
+if len(dates) > 1:
+    selected_dates = st.sidebar.select_slider(
+        "Date Range",
+        options=dates,
+        value=(dates[0], dates[-1]),
+        format_func=lambda d: f"{d[:4]}-{d[4:6]}-{d[6:]}"
+    )
+    if tuple(selected_dates) != (dates[0], dates[-1]):
+        date_range = tuple(selected_dates)
+
+active_filters = {
+    "newspaper_filter": newspaper if newspaper != "All" else None,
+    "sentiment_filter": sentiment_filter,
+    "date_range": date_range,
+}
+if any(active_filters.values()):
+    matching = sum(get_facets(**active_filters)["counts"].get("newspaper", {}).values())
+    st.sidebar.caption(f"{matching} articles match the selected filters.")
 
 # --- Main UI: Search ---
 query = st.text_input("Enter your question about Pakistani news:", placeholder="e.g., What are the latest developments in the PSL?", key="query_input")
 
 if query:
-    if not google_api_key:
+    if not rag_service_url and not google_api_key:
         st.error("Please provide a Google API Key in the sidebar.")
+    elif vs is not None and vs.index is None and vs.build_progress is not None:
+        build_error = vs.build_progress.as_dict()["error"]
+        if build_error:
+            st.error(f"The news index could not be built: {build_error}")
+        else:
+            st.info("The news index is being built. Search will be available in a few seconds.")
     else:
+        partial_index = vs is not None and vs.is_partial
         with st.spinner(f"Generating as {persona}..."):
             # Columns for comparison
             col1, col2 = st.columns(2)
@@ -82,13 +155,21 @@ if query:
             # --- RAG Answer ---
             with col1:
                 st.subheader("🔍 With RAG")
+                budget = RequestBudget(latency_budget)
                 rag_answer, sources = rag_engine.generate_rag_answer(
                     query, 
                     newspaper_filter=newspaper,
+                    date_range=date_range,
+                    sentiment_filter=sentiment_filter,
                     persona=persona,
-                    temperature=temperature
+                    temperature=temperature,
+                    budget=budget
                 )
                 st.markdown(rag_answer)
+                if budget.degradations:
+                    st.caption(f"Degraded to meet the latency budget: {', '.join(budget.degradations)}")
+                if partial_index:
+                    st.warning("Partial results: the index is still being built, so older articles may be missing.")
                 
                 if sources:
                     with st.expander("📂 View Source Chunks (Context)"):
@@ -101,16 +182,36 @@ if query:
             # --- Plain LLM Answer ---
             with col2:
                 st.subheader("🤖 Plain LLM (No RAG)")
+                # Shares the page budget with the RAG answer, so the page as a whole stays within it
                 plain_answer = rag_engine.generate_plain_answer(
                     query,
                     persona=persona,
-                    temperature=temperature
+                    temperature=temperature,
+                    budget=budget
                 )
                 st.markdown(plain_answer)
 
 # --- Footer ---
 st.sidebar.divider()
-if vs.index:
-    st.sidebar.info(f"Vector Store Status: Ready ({vs.index.ntotal} docs)")
+if vs is not None and vs.build_progress is not None:
+    progress = vs.build_progress.as_dict()
+    if progress["error"]:
+        st.sidebar.error(f"Index build failed: {progress['error']}")
+    elif not progress["finished"]:
+        total = progress["total_batches"] or 1
+        st.sidebar.progress(
+            min(progress["done_batches"] / total, 1.0),
+            text=f"Indexing news: {progress['done_batches']}/{total} days ({progress['documents']} articles)"
+        )
+        st.sidebar.button("🔄 Refresh status")
+if vs is None:
+    try:
+        st.sidebar.info(f"Vector Store Status: Remote ({rag_engine.health()['documents']} docs)")
+    except Exception as e:
+        st.sidebar.error(f"Vector Store Status: RAG service unreachable ({e})")
+elif vs.index:
+    st.sidebar.info(f"Vector Store Status: Ready ({len(vs.documents)} docs, {vs.index.ntotal} passages)")
+    cache_stats = vs.cache.stats()
+    st.sidebar.caption(f"Retrieval cache: {cache_stats['hit_rate']:.0%} hit rate ({cache_stats['entries']} cached queries)")
 else:
     st.sidebar.error("Vector Store Status: Not initialized")
@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from rag_engine import RETRIEVAL_UNIT
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_RETRIEVAL_BATCH_SIZE = 64
+DEFAULT_TOP_K = 5
+
+def load_questions(path):
+    """
+    Reads questions from a text file (one per line) or a JSONL file of {"id": ..., "question": ...}.
+    Questions without an id are numbered by line, so ids stay stable across resumed runs.
+    """
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                questions.append((str(record.get("id", line_no)), record["question"]))
+            else:
+                questions.append((str(line_no), line))
+    return questions
+
+def completed_ids(output_path):
+    """Returns the ids already answered successfully in an existing output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A partially written last line from an interrupted run
+                continue
+            if not record.get("error"):
+                done.add(str(record["id"]))
+    return done
+
+def compact_output(output_path):
+    """
+    Rewrites an existing output file with one successful record per id, dropping failed records
+    and a partially written last line, so questions retried on resume end up with a single record.
+    Returns the ids already answered.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    kept = []
+    changed = False
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                changed = True
+                continue
+            qid = str(record["id"])
+            if record.get("error") or qid in done:
+                changed = True
+                continue
+            done.add(qid)
+            kept.append(line if line.endswith("\n") else line + "\n")
+            changed = changed or not line.endswith("\n")
+
+    if changed:
+        tmp_path = output_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(kept)
+        os.replace(tmp_path, output_path)
+    return done
+
+class RateLimiter:
+    """Spaces out call starts so that at most `requests_per_minute` calls begin per minute."""
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class EchoLLM:
+    """Local stand-in for Gemini with the same `generate_content` interface, for offline runs and tests."""
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def generate_content(self, prompt, generation_config=None, request_options=None):
+        if self.latency:
+            time.sleep(self.latency)
+        documents = prompt.count("--- Document ")
+        question = prompt.rsplit("Question: ", 1)[-1].split("\n", 1)[0]
+        return _Response(f"Offline answer to '{question}' from {documents} documents.")
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+def run_batch(questions, rag_engine, output_path, concurrency=DEFAULT_CONCURRENCY,
+              requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, retrieval_batch_size=DEFAULT_RETRIEVAL_BATCH_SIZE,
+              top_k=DEFAULT_TOP_K, persona="Default", temperature=0.7, **filters):
+    """
+    Answers `questions` ([(id, question)]) and appends one JSON line per answer to `output_path`.
+    Retrieval runs in batches (one encode/search pass each) while earlier batches are already
+    being generated on `concurrency` workers, throttled to the LLM rate limit.
+    Questions already answered in `output_path` are skipped, so interrupted runs can resume;
+    failed records are removed before their questions are retried, leaving one record per id.
+    Returns a summary dict.
+    """
+    done = compact_output(output_path)
+    pending = [(qid, q) for qid, q in questions if qid not in done]
+    summary = {"total": len(questions), "skipped": len(questions) - len(pending), "answered": 0, "failed": 0}
+    if not pending:
+        return summary
+
+    limiter = RateLimiter(requests_per_minute)
+    write_lock = threading.Lock()
+    # Bounds how far retrieval may run ahead of generation
+    in_flight = threading.BoundedSemaphore(concurrency * 2)
+    started = time.monotonic()
+
+    def generate(qid, question, docs, out):
+        try:
+            record = {"id": qid, "question": question}
+            t0 = time.monotonic()
+            try:
+                if docs:
+                    limiter.wait()
+                    record["answer"] = rag_engine.generate_text(
+                        rag_engine.build_rag_prompt(question, docs, persona), temperature
+                    )
+                else:
+                    record["answer"] = "No relevant documents found to answer your question."
+            except Exception as e:
+                record["error"] = str(e)
+            record["sources"] = [
+                {k: doc['metadata'].get(k) for k in ("title", "newspaper", "date", "link")} for doc in docs
+            ]
+            record["elapsed"] = round(time.monotonic() - t0, 3)
+
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                out.flush()
+                summary["failed" if "error" in record else "answered"] += 1
+        finally:
+            in_flight.release()
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for start in range(0, len(pending), retrieval_batch_size):
+            batch = pending[start:start + retrieval_batch_size]
+            results = rag_engine.vector_store.search_batch(
+                [q for _, q in batch], top_k=top_k, unit=RETRIEVAL_UNIT, **filters
+            )
+            for (qid, question), docs in zip(batch, results):
+                in_flight.acquire()
+                pool.submit(generate, qid, question, docs, out)
+
+    summary["elapsed"] = round(time.monotonic() - started, 3)
+    return summary
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    from vector_store import VectorStore
+    from rag_engine import RAGEngine
+
+    parser = argparse.ArgumentParser(description="Answer a file of questions with RAG and stream results to JSONL.")
+    parser.add_argument("questions", help="Text file with one question per line, or JSONL with id/question.")
+    parser.add_argument("--output", default="answers.jsonl", help="JSONL file to append answers to (resumable).")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Concurrent LLM calls.")
+    parser.add_argument("--rpm", type=float, default=DEFAULT_REQUESTS_PER_MINUTE, help="LLM requests per minute (0 = unlimited).")
+    parser.add_argument("--retrieval-batch-size", type=int, default=DEFAULT_RETRIEVAL_BATCH_SIZE)
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--persona", default="Default")
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--newspaper", help="Only retrieve from this newspaper.")
+    parser.add_argument("--date-from", help="Earliest date, YYYYMMDD.")
+    parser.add_argument("--date-to", help="Latest date, YYYYMMDD.")
+    parser.add_argument("--fake-llm", action="store_true", help="Use a local echo model instead of Gemini.")
+    args = parser.parse_args()
+
+    vs = VectorStore()
+    if not vs.load_index():
+        raise SystemExit("Index not found. Build it first with `python vector_store.py`.")
+    rag = RAGEngine(vs, model=EchoLLM() if args.fake_llm else None)
+
+    date_range = (args.date_from, args.date_to) if args.date_from or args.date_to else None
+    summary = run_batch(
+        load_questions(args.questions), rag, args.output,
+        concurrency=args.concurrency, requests_per_minute=args.rpm,
+        retrieval_batch_size=args.retrieval_batch_size, top_k=args.top_k,
+        persona=args.persona, temperature=args.temperature,
+        newspaper_filter=args.newspaper, date_range=date_range,
+    )
+    print(json.dumps(summary, indent=2))
@@ -5,34 +5,34 @@ import re
 
 DATA_DIR = "data"
 
-def load_all_csvs(data_dir=DATA_DIR):
+def parse_filename(basename):
     """
-    Loads all CSV files from the data directory.
-    Returns a unified DataFrame with 'newspaper' and 'date' metadata.
+    Extracts newspaper and date from a filename.
+    Pattern: {newspaper}_{date}.csv, date format: YYYYMMDD
     """
-    all_files = glob.glob(os.path.join(data_dir, "*.csv"))
+    newspaper = ""
+    date_str = ""
+    
+    if basename.startswith("the_news_"):
+        newspaper = "The News"
+        match = re.search(r"the_news_(\d{8})\.csv", basename)
+        if match:
+            date_str = match.group(1)
+    elif basename.startswith("tribune_"):
+        newspaper = "Tribune"
+        match = re.search(r"tribune_(\d{8})\.csv", basename)
+        if match:
+            date_str = match.group(1)
+
+    return newspaper, date_str
+
+def load_csvs(filenames):
+    """Loads the given CSV files into one DataFrame with 'newspaper', 'date' and 'source_file' metadata."""
     df_list = []
 
-    for filename in all_files:
+    for filename in filenames:
         basename = os.path.basename(filename)
-        
-        # Extract newspaper and date from filename
-        # Pattern: {newspaper}_{date}.csv
-        # date format: YYYYMMDD
-        
-        newspaper = ""
-        date_str = ""
-        
-        if basename.startswith("the_news_"):
-            newspaper = "The News"
-            match = re.search(r"the_news_(\d{8})\.csv", basename)
-            if match:
-                date_str = match.group(1)
-        elif basename.startswith("tribune_"):
-            newspaper = "Tribune"
-            match = re.search(r"tribune_(\d{8})\.csv", basename)
-            if match:
-                date_str = match.group(1)
+        newspaper, date_str = parse_filename(basename)
         
         try:
             df = pd.read_csv(filename)
@@ -48,6 +48,64 @@ def load_all_csvs(data_dir=DATA_DIR):
 
     return pd.concat(df_list, ignore_index=True)
 
+def load_all_csvs(data_dir=DATA_DIR):
+    """
+    Loads all CSV files from the data directory.
+    Returns a unified DataFrame with 'newspaper' and 'date' metadata.
+    """
+    return load_csvs(glob.glob(os.path.join(data_dir, "*.csv")))
+
+def group_files_by_day(data_dir=DATA_DIR):
+    """Returns [(date, [csv files])] for every day in the data directory, newest day first."""
+    days = {}
+    for filename in glob.glob(os.path.join(data_dir, "*.csv")):
+        _, date_str = parse_filename(os.path.basename(filename))
+        days.setdefault(date_str, []).append(filename)
+    return sorted(days.items(), reverse=True)
+
+def iter_daily_documents(data_dir=DATA_DIR):
+    """
+    Yields (date, documents) one day at a time, newest first,
+    so an index can be built incrementally and the latest news is searchable first.
+    """
+    for date_str, filenames in group_files_by_day(data_dir):
+        df = load_csvs(filenames)
+        if not df.empty:
+            yield date_str, preprocess_documents(df)
+
+# MiniLM truncates inputs at 256 word pieces; passages stay well below that
+PASSAGE_MAX_WORDS = 120
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def split_passages(text, max_words=PASSAGE_MAX_WORDS):
+    """
+    Splits text into sentence-aligned passages of at most `max_words` words
+    (a single longer sentence becomes its own passage).
+    Returns (start, end) character offsets into `text`, so passages never copy the article.
+    """
+    boundaries = [0] + [m.end() for m in _SENTENCE_BREAK.finditer(text)] + [len(text)]
+    spans = []
+    start, end, words = None, None, 0
+    for s, e in zip(boundaries, boundaries[1:]):
+        sentence_words = len(text[s:e].split())
+        if not sentence_words:
+            continue
+        if start is not None and words + sentence_words > max_words:
+            spans.append((start, end))
+            start, words = None, 0
+        if start is None:
+            start = s
+        end = s + len(text[s:e].rstrip())
+        words += sentence_words
+    if start is not None:
+        spans.append((start, end))
+    return spans
+
+def normalize_sentiment(value):
+    """Turns scraped labels such as "['NEGATIVE']" into plain facet values like "NEGATIVE"."""
+    label = str(value).strip().strip("[]").strip().strip("'\"").strip()
+    return label.upper() if label else "UNKNOWN"
+
 def preprocess_documents(df):
     """
     Preprocesses the DataFrame into a list of document dictionaries.
@@ -86,7 +144,7 @@ def preprocess_documents(df):
             "date": row['date'],
             "title": title,
             "link": row.get('link', ''), # Tribune might not have link, default to empty
-            "sentiment": row.get('title_sentiment', 'UNKNOWN'),
+            "sentiment": normalize_sentiment(row.get('title_sentiment', '')),
             "source_file": row['source_file']
         }
 
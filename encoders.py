@@ -0,0 +1,60 @@
+import copy
+import numpy as np
+
+ENCODER_BACKENDS = ("float", "int8")
+# Queries the fast encoder is checked against before it is used
+AGREEMENT_QUERIES = [
+    "What happened with the Indus Water Treaty?",
+    "Who won the PSL final?",
+    "Latest fuel prices in Pakistan",
+    "IMF loan negotiations and the federal budget",
+    "Cricket match in Karachi",
+    "Flood warnings for Punjab and Sindh",
+]
+MIN_AGREEMENT = 0.98
+
+def load_query_model(model, backend="float", num_threads=None):
+    """
+    Returns the model used to encode queries.
+    "float" reuses `model` as is. "int8" returns a CPU copy with dynamic int8 quantization
+    of its Linear layers, which is markedly faster for single short queries while producing
+    embeddings compatible with the float document index. `num_threads` sets torch intra-op threads.
+    """
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend: {backend}. Choose from {ENCODER_BACKENDS}.")
+
+    if num_threads:
+        import torch
+        torch.set_num_threads(num_threads)
+    if backend == "float":
+        return model
+
+    import torch
+    # Quantize a CPU copy so the float model used for documents is left untouched
+    cpu_copy = copy.deepcopy(model).to("cpu")
+    return torch.quantization.quantize_dynamic(cpu_copy, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+def encoder_agreement(reference_model, query_model, texts=AGREEMENT_QUERIES):
+    """Cosine similarity between the two models' embeddings of `texts`: {'mean': ..., 'min': ...}."""
+    reference = np.asarray(reference_model.encode(list(texts), show_progress_bar=False), dtype='float32')
+    fast = np.asarray(query_model.encode(list(texts), show_progress_bar=False), dtype='float32')
+    cosines = (reference * fast).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(fast, axis=1) + 1e-12
+    )
+    return {"mean": float(cosines.mean()), "min": float(cosines.min())}
+
+if __name__ == "__main__":
+    # Compare query-encoding latency and agreement of the backends
+    import time
+    from sentence_transformers import SentenceTransformer
+    from vector_store import MODEL_NAME
+
+    model = SentenceTransformer(MODEL_NAME)
+    for backend in ENCODER_BACKENDS:
+        query_model = load_query_model(model, backend)
+        query_model.encode(AGREEMENT_QUERIES[:1], show_progress_bar=False)  # warm up
+        start = time.perf_counter()
+        for query in AGREEMENT_QUERIES * 10:
+            query_model.encode([query], show_progress_bar=False)
+        per_query_ms = (time.perf_counter() - start) * 1000 / (len(AGREEMENT_QUERIES) * 10)
+        print(f"{backend}: {per_query_ms:.2f} ms/query, agreement {encoder_agreement(model, query_model)}")
@@ -0,0 +1,39 @@
+import math
+import time
+
+class RequestBudget:
+    """
+    Per-request latency budget passed through retrieval, reranking and generation.
+    Each stage checks the remaining time and records the degradations it applies,
+    so the response can report what was dropped to stay within the deadline.
+    """
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.deadline = None if seconds is None else self.started + seconds
+        self.degradations = []
+
+    def remaining(self):
+        if self.deadline is None:
+            return math.inf
+        return max(0.0, self.deadline - time.monotonic())
+
+    def allows(self, seconds):
+        """True if at least `seconds` of the budget are left."""
+        return self.remaining() >= seconds
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, reserve=0.0):
+        """Timeout for a blocking call that must leave `reserve` seconds for later stages; None if unbounded."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.remaining() - reserve)
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def degrade(self, name):
+        if name not in self.degradations:
+            self.degradations.append(name)
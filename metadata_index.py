@@ -0,0 +1,75 @@
+import numpy as np
+
+FACET_FIELDS = ("newspaper", "sentiment", "source_file")
+DATE_FIELD = "date"
+
+class MetadataIndex:
+    """
+    Inverted index over document metadata.
+    Each facet value maps to a boolean bitmap over document IDs, and dates are kept
+    as a sorted integer column, so filter combinations are a few vectorised ANDs.
+    """
+    def __init__(self, metadatas, facet_fields=FACET_FIELDS, date_field=DATE_FIELD):
+        self.size = len(metadatas)
+        self.facet_fields = tuple(facet_fields)
+        self.bitmaps = {}
+        for field in self.facet_fields:
+            values = np.array([str(m.get(field, "")) for m in metadatas], dtype=object)
+            self.bitmaps[field] = {value: values == value for value in np.unique(values)} if self.size else {}
+
+        # Dates are YYYYMMDD strings; missing or malformed dates sort first as 0.
+        dates = np.array([_date_to_int(m.get(date_field)) for m in metadatas], dtype=np.int64)
+        self._date_order = np.argsort(dates, kind="stable")
+        self._sorted_dates = dates[self._date_order]
+
+    @classmethod
+    def from_documents(cls, documents, **kwargs):
+        return cls([doc['metadata'] for doc in documents], **kwargs)
+
+    def filter(self, facets=None, date_from=None, date_to=None):
+        """
+        Returns a boolean mask of the documents matching every facet and the inclusive date range,
+        or None when no filter is active.
+        `facets` maps a field to one value or a list of accepted values (OR within a field).
+        """
+        mask = None
+        for field, accepted in (facets or {}).items():
+            if accepted is None or accepted == "All":
+                continue
+            if isinstance(accepted, str):
+                accepted = [accepted]
+            field_mask = np.zeros(self.size, dtype=bool)
+            for value in accepted:
+                bitmap = self.bitmaps.get(field, {}).get(str(value))
+                if bitmap is not None:
+                    field_mask |= bitmap
+            mask = field_mask if mask is None else mask & field_mask
+
+        if date_from or date_to:
+            lo = np.searchsorted(self._sorted_dates, _date_to_int(date_from), side="left") if date_from else 0
+            hi = np.searchsorted(self._sorted_dates, _date_to_int(date_to), side="right") if date_to else self.size
+            date_mask = np.zeros(self.size, dtype=bool)
+            date_mask[self._date_order[lo:hi]] = True
+            mask = date_mask if mask is None else mask & date_mask
+
+        return mask
+
+    def facet_counts(self, mask=None):
+        """Returns {field: {value: count}} over all documents, or only those selected by `mask`."""
+        counts = {}
+        for field, bitmaps in self.bitmaps.items():
+            counts[field] = {
+                value: int(np.count_nonzero(bitmap if mask is None else bitmap & mask))
+                for value, bitmap in bitmaps.items()
+            }
+        return counts
+
+    def unique_dates(self):
+        """Returns the distinct dates present in the index as sorted YYYYMMDD strings."""
+        return [str(d) for d in np.unique(self._sorted_dates) if d > 0]
+
+def _date_to_int(value):
+    try:
+        return int(str(value)[:8])
+    except (TypeError, ValueError):
+        return 0
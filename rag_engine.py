@@ -1,9 +1,19 @@
 import os
 import google.generativeai as genai
 from vector_store import VectorStore
+from latency_budget import RequestBudget
 
 MODEL_NAME = "gemini-flash-latest"
 
+# Latency budget policies (seconds of budget that must remain)
+DEFAULT_TOP_K = 5
+# Send only the matched passages, not whole articles, to keep prompts short
+RETRIEVAL_UNIT = "passages"
+SHRUNK_TOP_K = 2
+BUDGET_SHRINK_CONTEXT_SECONDS = 5.0  # Below this after retrieval, send only the best SHRUNK_TOP_K documents
+BUDGET_MIN_GENERATION_SECONDS = 2.0  # Below this, return the sources without an answer
+SOURCES_ONLY_ANSWER = "No answer could be generated within the latency budget. Please review the retrieved sources."
+
 PERSONA_PROMPTS = {
     "Default": "You are a helpful assistant for a Pakistani news analysis system.",
     "Journalist": "You are a professional reporter. Summarize the news based only on the provided context. Maintain an objective tone.",
@@ -13,7 +23,8 @@ PERSONA_PROMPTS = {
 }
 
 class RAGEngine:
-    def __init__(self, vector_store: VectorStore):
+    def __init__(self, vector_store: VectorStore, model=None):
+        """`model` is any object with Gemini's `generate_content` interface; defaults to Gemini itself."""
         self.vector_store = vector_store
         
         # Configure Gemini API if not already configured
@@ -21,13 +32,18 @@ class RAGEngine:
         if api_key:
             genai.configure(api_key=api_key)
             
-        self.model = genai.GenerativeModel(MODEL_NAME)
+        self.model = model if model is not None else genai.GenerativeModel(MODEL_NAME)
 
     def generate_rag_answer(self, query, newspaper_filter="All", date_filter=None, 
-                           persona="Default", temperature=0.7):
+                           persona="Default", temperature=0.7, date_range=None, sentiment_filter=None,
+                           budget=None):
         """
         Generates an answer using RAG (Retrieval-Augmented Generation).
+        With a RequestBudget, the context shrinks and the answer is dropped (sources are still
+        returned) when time runs low; applied degradations are recorded on the budget.
         """
+        budget = budget or RequestBudget()
+
         # 1. Retrieve context
         if self.vector_store.index is None:
              if not self.vector_store.load_index():
@@ -35,15 +51,45 @@ class RAGEngine:
 
         retrieved_docs = self.vector_store.search(
             query, 
-            top_k=5, 
+            top_k=DEFAULT_TOP_K, 
             newspaper_filter=newspaper_filter if newspaper_filter != "All" else None,
-            date_filter=date_filter
+            date_filter=date_filter,
+            date_range=date_range,
+            sentiment_filter=sentiment_filter,
+            unit=RETRIEVAL_UNIT
         )
         
         if not retrieved_docs:
             return "No relevant documents found to answer your question.", []
 
-        # 2. Construct Prompt
+        return self.answer_from_documents(query, retrieved_docs, persona, temperature, budget)
+
+    def answer_from_documents(self, query, retrieved_docs, persona="Default", temperature=0.7, budget=None):
+        """
+        Generates the RAG answer for already retrieved documents.
+        Returns (answer, sources) like generate_rag_answer.
+        """
+        budget = budget or RequestBudget()
+        if not budget.allows(BUDGET_MIN_GENERATION_SECONDS):
+            budget.degrade("sources_only")
+            return SOURCES_ONLY_ANSWER, retrieved_docs
+        # Decided after retrieval, so the time retrieval took counts
+        if not budget.allows(BUDGET_SHRINK_CONTEXT_SECONDS) and len(retrieved_docs) > SHRUNK_TOP_K:
+            budget.degrade("shrunk_context")
+            retrieved_docs = retrieved_docs[:SHRUNK_TOP_K]
+
+        prompt = self.build_rag_prompt(query, retrieved_docs, persona)
+        
+        try:
+            return self.generate_text(prompt, temperature, budget), retrieved_docs
+        except Exception as e:
+            if budget.expired():
+                budget.degrade("generation_timeout")
+                return SOURCES_ONLY_ANSWER, retrieved_docs
+            return f"Error generating answer: {e}", []
+
+    def build_rag_prompt(self, query, retrieved_docs, persona="Default"):
+        """Builds the grounded prompt for the query from the retrieved documents."""
         context_str = "\n\n".join(
             [f"--- Document {i+1} ---\n{doc['text']}" for i, doc in enumerate(retrieved_docs)]
         )
@@ -62,22 +108,30 @@ class RAGEngine:
             "- Cite newspapers where applicable."
         )
         
-        prompt = f"{system_instruction}\n\nContext:\n{context_str}\n\nQuestion: {query}\n\nAnswer:"
-        
-        # 3. Generate Answer
-        try:
-            generation_config = genai.types.GenerationConfig(
-                temperature=temperature
-            )
-            response = self.model.generate_content(prompt, generation_config=generation_config)
-            return response.text, retrieved_docs
-        except Exception as e:
-            return f"Error generating answer: {e}", []
+        return f"{system_instruction}\n\nContext:\n{context_str}\n\nQuestion: {query}\n\nAnswer:"
+
+    def generate_text(self, prompt, temperature=0.7, budget=None):
+        """Sends the prompt to the LLM, bounded by the budget's deadline. Raises on failure."""
+        generation_config = genai.types.GenerationConfig(
+            temperature=temperature
+        )
+        timeout = budget.timeout() if budget is not None else None
+        response = self.model.generate_content(
+            prompt,
+            generation_config=generation_config,
+            request_options={"timeout": timeout} if timeout is not None else None
+        )
+        return response.text
 
-    def generate_plain_answer(self, query, persona="Default", temperature=0.7):
+    def generate_plain_answer(self, query, persona="Default", temperature=0.7, budget=None):
         """
         Generates an answer using the LLM's internal knowledge only (No RAG).
+        With a `budget`, the call is bounded by its deadline and skipped when too little time is left.
         """
+        budget = budget or RequestBudget()
+        if not budget.allows(BUDGET_MIN_GENERATION_SECONDS):
+            budget.degrade("skipped_plain_answer")
+            return "Skipped: no time left in the latency budget for a plain answer."
         persona_instruction = PERSONA_PROMPTS.get(persona, PERSONA_PROMPTS["Default"])
         
         system_instruction = (
@@ -91,12 +145,10 @@ class RAGEngine:
         prompt = f"{system_instruction}\n\nQuestion: {query}\n\nAnswer:"
         
         try:
-            generation_config = genai.types.GenerationConfig(
-                temperature=temperature
-            )
-            response = self.model.generate_content(prompt, generation_config=generation_config)
-            return response.text
+            return self.generate_text(prompt, temperature, budget)
         except Exception as e:
+            if budget.expired():
+                budget.degrade("plain_answer_timeout")
             return f"Error generating answer: {e}"
 
 if __name__ == "__main__":
@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 1024
+
+class ResultCache:
+    """
+    Bounded LRU cache of retrieval results.
+    Only document IDs and scores are stored; callers map them back to the documents
+    of the index version the key was built for.
+    """
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(query, index_version, top_k, **filters):
+        """Builds a key from the whitespace/case-normalised query, the index version, top_k and filters."""
+        normalized = " ".join(str(query).lower().split())
+        return (normalized, index_version, int(top_k), tuple(sorted((k, _hashable(v)) for k, v in filters.items())))
+
+    def get(self, key):
+        """Returns (ids, scores) or None, counting the lookup as a hit or a miss."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, ids, scores):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (tuple(int(i) for i in ids), tuple(float(s) for s in scores))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+def _hashable(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    return value
@@ -0,0 +1,332 @@
+import argparse
+import json
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from latency_budget import RequestBudget
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 5.0
+DEFAULT_RESULT_TIMEOUT = 60.0  # Seconds a caller waits for its batch before giving up
+
+class MicroBatcher:
+    """
+    Collects concurrent search requests into micro-batches so that query encoding
+    and the FAISS search run once per batch instead of once per request.
+    """
+    def __init__(self, vector_store, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 result_timeout=DEFAULT_RESULT_TIMEOUT):
+        self.vector_store = vector_store
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.result_timeout = result_timeout
+        self._queue = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, query, top_k=5, **filters):
+        """
+        Queues a single query and returns a Future resolving to its list of documents.
+        `filters` are passed through to VectorStore.search_batch.
+        Raises TypeError for filter values that cannot be grouped (e.g. dicts).
+        """
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed.")
+        params = (top_k, tuple(sorted((name, _hashable(value)) for name, value in filters.items())))
+        try:
+            hash(params)
+        except TypeError:
+            raise TypeError(f"Unsupported filter value in {filters!r}") from None
+        future = Future()
+        self._queue.put((params, query, future))
+        return future
+
+    def search(self, query, top_k=5, **filters):
+        return self.submit(query, top_k, **filters).result(timeout=self.result_timeout)
+
+    def search_batch(self, queries, top_k=5, **filters):
+        futures = [self.submit(q, top_k, **filters) for q in queries]
+        return [f.result(timeout=self.result_timeout) for f in futures]
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Put the shutdown marker back so the run loop exits after this batch.
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            try:
+                self._search(batch)
+            except Exception as e:
+                # Never let one bad batch kill the worker; fail whatever is still pending instead.
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _search(self, batch):
+        # Requests with different parameters are searched separately, but still batched among themselves.
+        groups = {}
+        for params, query, future in batch:
+            groups.setdefault(params, []).append((query, future))
+
+        for (top_k, filters), items in groups.items():
+            try:
+                results = self.vector_store.search_batch([q for q, _ in items], top_k=top_k, **dict(filters))
+                if len(results) != len(items):
+                    raise RuntimeError(f"search_batch returned {len(results)} results for {len(items)} queries.")
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), docs in zip(items, results):
+                future.set_result(docs)
+
+def _hashable(value):
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+class _BatchedVectorStore:
+    """Routes `search` through the micro-batcher while exposing the rest of the VectorStore unchanged."""
+    def __init__(self, vector_store, batcher):
+        self._vector_store = vector_store
+        self._batcher = batcher
+
+    def search(self, query, top_k=5, **filters):
+        return self._batcher.search(query, top_k, **filters)
+
+    def __getattr__(self, name):
+        return getattr(self._vector_store, name)
+
+class RAGService:
+    """Shares one warm VectorStore and RAGEngine between all HTTP clients."""
+    def __init__(self, vector_store, rag_engine=None, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.vector_store = vector_store
+        self.batcher = MicroBatcher(vector_store, max_batch_size, max_wait_ms)
+        if rag_engine is None:
+            from rag_engine import RAGEngine
+            rag_engine = RAGEngine(_BatchedVectorStore(vector_store, self.batcher))
+        self.rag_engine = rag_engine
+
+    def health(self, payload=None):
+        index = self.vector_store.index
+        return {
+            "status": "ok",
+            "documents": len(self.vector_store.documents) if index is not None else 0,
+            "cache": self.vector_store.cache.stats(),
+        }
+
+    def search(self, payload):
+        results = self.batcher.search(payload["query"], top_k=int(payload.get("top_k", 5)), **_search_options(payload))
+        return {"results": results}
+
+    def search_batch(self, payload):
+        results = self.batcher.search_batch(payload["queries"], top_k=int(payload.get("top_k", 5)), **_search_options(payload))
+        return {"results": results}
+
+    def facets(self, payload):
+        mask = self.vector_store.filter_mask(**_filters(payload))
+        return {
+            "counts": self.vector_store.metadata_index.facet_counts(mask),
+            "dates": self.vector_store.metadata_index.unique_dates(),
+        }
+
+    def answer(self, payload):
+        persona = payload.get("persona", "Default")
+        temperature = float(payload.get("temperature", 0.7))
+        budget_seconds = payload.get("budget_seconds")
+        budget = RequestBudget(float(budget_seconds) if budget_seconds is not None else None)
+        if not payload.get("use_rag", True):
+            answer = self.rag_engine.generate_plain_answer(
+                payload["query"], persona=persona, temperature=temperature, budget=budget
+            )
+            return {"answer": answer, "sources": [], "degradations": budget.degradations}
+        filters = _filters(payload)
+        filters["newspaper_filter"] = filters.get("newspaper_filter") or "All"
+        answer, sources = self.rag_engine.generate_rag_answer(
+            payload["query"], persona=persona, temperature=temperature, budget=budget, **filters
+        )
+        return {"answer": answer, "sources": sources, "degradations": budget.degradations}
+
+    def close(self):
+        self.batcher.close()
+
+FILTER_FIELDS = ("newspaper_filter", "date_filter", "date_range", "sentiment_filter")
+
+RESULT_FIELDS = ("unit", "aggregation")
+
+def _filters(payload):
+    return {name: payload[name] for name in FILTER_FIELDS if payload.get(name) is not None}
+
+def _search_options(payload):
+    options = _filters(payload)
+    options.update({name: payload[name] for name in RESULT_FIELDS if payload.get(name) is not None})
+    return options
+
+def make_handler(service):
+    routes = {
+        ("GET", "/health"): service.health,
+        ("POST", "/search"): service.search,
+        ("POST", "/search_batch"): service.search_batch,
+        ("POST", "/answer"): service.answer,
+        ("POST", "/facets"): service.facets,
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def _dispatch(self, method):
+            handler = routes.get((method, self.path.split("?", 1)[0]))
+            if handler is None:
+                return self._send(404, {"error": f"Unknown endpoint {self.path}"})
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length)) if length else {}
+                self._send(200, handler(payload))
+            except (KeyError, ValueError, TypeError) as e:
+                self._send(400, {"error": f"Bad request: {e}"})
+            except FutureTimeoutError:
+                self._send(504, {"error": "Search timed out."})
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+
+        def _send(self, status, body):
+            data = json.dumps(body, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def create_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    return ThreadingHTTPServer((host, port), make_handler(service))
+
+def _budget_seconds(budget):
+    return budget.remaining() if budget is not None and budget.seconds is not None else None
+
+class RAGServiceClient:
+    """
+    Thin HTTP client with the same search/answer methods the Streamlit app uses,
+    so UI workers can share one remote index instead of loading their own.
+    """
+    def __init__(self, base_url, timeout=60):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=data,
+            headers={"Content-Type": "application/json"},
+            method="POST" if data is not None else "GET",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def health(self):
+        return self._call("/health")
+
+    def search(self, query, top_k=5, **filters):
+        return self._call("/search", {"query": query, "top_k": top_k, **filters})["results"]
+
+    def search_batch(self, queries, top_k=5, **filters):
+        return self._call("/search_batch", {"queries": list(queries), "top_k": top_k, **filters})["results"]
+
+    def facets(self, **filters):
+        return self._call("/facets", filters)
+
+    def generate_rag_answer(self, query, newspaper_filter="All", date_filter=None,
+                            persona="Default", temperature=0.7, budget=None, **filters):
+        try:
+            body = self._call("/answer", {
+                "query": query, "newspaper_filter": newspaper_filter, "date_filter": date_filter,
+                "persona": persona, "temperature": temperature,
+                "budget_seconds": _budget_seconds(budget),
+                **filters,
+            })
+        except Exception as e:
+            return f"Error contacting RAG service: {e}", []
+        if budget is not None:
+            for name in body.get("degradations", []):
+                budget.degrade(name)
+        return body["answer"], body["sources"]
+
+    def generate_plain_answer(self, query, persona="Default", temperature=0.7, budget=None):
+        try:
+            body = self._call("/answer", {
+                "query": query, "persona": persona, "temperature": temperature, "use_rag": False,
+                "budget_seconds": _budget_seconds(budget),
+            })
+        except Exception as e:
+            return f"Error contacting RAG service: {e}"
+        if budget is not None:
+            for name in body.get("degradations", []):
+                budget.degrade(name)
+        return body["answer"]
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    from vector_store import VectorStore
+
+    parser = argparse.ArgumentParser(description="Serve retrieval and RAG answers over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help="How long to wait for more queries before searching a batch.")
+    args = parser.parse_args()
+
+    vs = VectorStore()
+    if not vs.load_index():
+        raise SystemExit("Index not found. Build it first with `python vector_store.py`.")
+    vs.start_watcher()
+
+    service = RAGService(vs, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    server = create_server(service, args.host, args.port)
+    print(f"RAG service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -0,0 +1,171 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from batch_runner import EchoLLM, RateLimiter, compact_output, completed_ids, load_questions, run_batch
+from rag_engine import RAGEngine
+
+class StubVectorStore:
+    """Returns one passage per query and records the queries of every search_batch call."""
+    def __init__(self):
+        self.calls = []
+
+    def search_batch(self, queries, top_k=5, unit="articles", **filters):
+        self.calls.append(list(queries))
+        return [[{
+            "text": f"Passage about {q}",
+            "metadata": {"title": q, "newspaper": "The News", "date": "20250601", "link": "http://example.com"},
+        }] for q in queries]
+
+class ProbeLLM(EchoLLM):
+    """EchoLLM that tracks how many calls run at once and can fail chosen questions."""
+    def __init__(self, latency=0.0, fail_on=()):
+        super().__init__(latency)
+        self.fail_on = set(fail_on)
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None, request_options=None):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            question = prompt.rsplit("Question: ", 1)[-1].split("\n", 1)[0]
+            if question in self.fail_on:
+                raise RuntimeError("quota exceeded")
+            return super().generate_content(prompt, generation_config, request_options)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+def read_records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+class LoadQuestionsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_text_file_is_numbered_by_line(self):
+        path = self._write("questions.txt", "Who won the PSL?\n\n# a comment\nFuel prices?\n")
+        self.assertEqual(load_questions(path), [("1", "Who won the PSL?"), ("4", "Fuel prices?")])
+
+    def test_jsonl_uses_ids_and_falls_back_to_line_numbers(self):
+        path = self._write("questions.jsonl", '{"id": "a", "question": "Who won?"}\n{"question": "Fuel?"}\n')
+        self.assertEqual(load_questions(path), [("a", "Who won?"), ("2", "Fuel?")])
+
+class RunBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, "answers.jsonl")
+        self.store = StubVectorStore()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _run(self, questions, llm, **kwargs):
+        kwargs.setdefault("requests_per_minute", 0)
+        return run_batch(questions, RAGEngine(self.store, model=llm), self.output, **kwargs)
+
+    def test_answers_every_question(self):
+        questions = [(str(i), f"question {i}") for i in range(5)]
+        summary = self._run(questions, ProbeLLM(), retrieval_batch_size=2)
+
+        self.assertEqual((summary["answered"], summary["failed"], summary["skipped"]), (5, 0, 0))
+        records = read_records(self.output)
+        self.assertEqual(sorted(r["id"] for r in records), [str(i) for i in range(5)])
+        self.assertTrue(all(r["answer"].startswith("Offline answer") for r in records))
+        self.assertEqual(records[0]["sources"][0]["newspaper"], "The News")
+        self.assertEqual([len(c) for c in self.store.calls], [2, 2, 1])
+
+    def test_resume_skips_answered_ids(self):
+        self._run([("1", "first"), ("2", "second")], ProbeLLM())
+        self.store.calls.clear()
+
+        summary = self._run([("1", "first"), ("2", "second"), ("3", "third")], ProbeLLM())
+
+        self.assertEqual((summary["skipped"], summary["answered"]), (2, 1))
+        self.assertEqual(self.store.calls, [["third"]])
+        self.assertEqual(len(read_records(self.output)), 3)
+
+    def test_failed_records_are_rerun(self):
+        questions = [("1", "first"), ("2", "second")]
+        summary = self._run(questions, ProbeLLM(fail_on={"second"}))
+        self.assertEqual((summary["answered"], summary["failed"]), (1, 1))
+        self.assertEqual(completed_ids(self.output), {"1"})
+
+        summary = self._run(questions, ProbeLLM())
+        self.assertEqual((summary["skipped"], summary["answered"], summary["failed"]), (1, 1, 0))
+        records = read_records(self.output)
+        self.assertEqual(sorted(r["id"] for r in records), ["1", "2"])
+        self.assertFalse(any("error" in r for r in records))
+
+    def test_truncated_last_line_is_ignored(self):
+        self._run([("1", "first")], ProbeLLM())
+        with open(self.output, "a", encoding="utf-8") as f:
+            f.write('{"id": "2", "answ')
+        self.assertEqual(completed_ids(self.output), {"1"})
+
+        # Resuming drops the fragment, so the next record is not appended onto it
+        self._run([("1", "first"), ("2", "second")], ProbeLLM())
+        self.assertEqual([r["id"] for r in read_records(self.output)], ["1", "2"])
+
+    def test_compact_output_keeps_one_successful_record_per_id(self):
+        with open(self.output, "w", encoding="utf-8") as f:
+            f.write('{"id": "1", "answer": "a"}\n{"id": "2", "error": "quota"}\n{"id": "1", "answer": "b"}\n')
+        self.assertEqual(compact_output(self.output), {"1"})
+        self.assertEqual(read_records(self.output), [{"id": "1", "answer": "a"}])
+
+    def test_concurrency_bound_holds(self):
+        llm = ProbeLLM(latency=0.05)
+        questions = [(str(i), f"question {i}") for i in range(12)]
+        summary = self._run(questions, llm, concurrency=3, retrieval_batch_size=4)
+
+        self.assertEqual(summary["answered"], 12)
+        self.assertLessEqual(llm.max_active, 3)
+        self.assertGreater(llm.max_active, 1)
+
+class RateLimiterTest(unittest.TestCase):
+    def test_spaces_out_call_starts(self):
+        limiter = RateLimiter(requests_per_minute=1200)  # one call every 50 ms
+        starts = []
+        lock = threading.Lock()
+
+        def call():
+            limiter.wait()
+            with lock:
+                starts.append(time.monotonic())
+
+        threads = [threading.Thread(target=call) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        starts.sort()
+        gaps = [b - a for a, b in zip(starts, starts[1:])]
+        self.assertTrue(all(gap >= 0.04 for gap in gaps), gaps)
+        self.assertGreaterEqual(starts[-1] - starts[0], 0.19)
+
+    def test_unlimited_does_not_wait(self):
+        limiter = RateLimiter(requests_per_minute=0)
+        started = time.monotonic()
+        for _ in range(100):
+            limiter.wait()
+        self.assertLess(time.monotonic() - started, 0.05)
+
+if __name__ == "__main__":
+    unittest.main()
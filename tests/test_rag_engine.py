@@ -0,0 +1,103 @@
+import unittest
+from unittest import mock
+
+from batch_runner import EchoLLM
+from latency_budget import RequestBudget
+from rag_engine import SHRUNK_TOP_K, SOURCES_ONLY_ANSWER, RAGEngine
+
+class FakeClock:
+    """Replaces time.monotonic in latency_budget so tests decide how long each stage takes."""
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+class SlowVectorStore:
+    """Returns five passages per query after `latency` seconds of fake time."""
+    def __init__(self, clock, latency=0.0):
+        self.clock = clock
+        self.latency = latency
+        self.index = object()
+
+    def search(self, query, top_k=5, **filters):
+        self.clock.advance(self.latency)
+        return [{"text": f"Passage {i}", "metadata": {"title": f"t{i}", "newspaper": "The News", "date": "20250601"}}
+                for i in range(top_k)]
+
+class SlowLLM(EchoLLM):
+    """Takes `latency` seconds of fake time, or times out like Gemini when that exceeds the request timeout."""
+    def __init__(self, clock, latency=0.0):
+        super().__init__()
+        self.clock = clock
+        self.fake_latency = latency
+        self.prompts = []
+
+    def generate_content(self, prompt, generation_config=None, request_options=None):
+        self.prompts.append(prompt)
+        timeout = (request_options or {}).get("timeout")
+        if timeout is not None and self.fake_latency > timeout:
+            self.clock.advance(timeout)
+            raise TimeoutError("Deadline exceeded")
+        self.clock.advance(self.fake_latency)
+        return super().generate_content(prompt, generation_config, request_options)
+
+class BudgetDegradationTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("latency_budget.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _answer(self, budget_seconds, retrieval=0.0, generation=0.0):
+        self.llm = SlowLLM(self.clock, generation)
+        engine = RAGEngine(SlowVectorStore(self.clock, retrieval), model=self.llm)
+        budget = RequestBudget(budget_seconds)
+        answer, sources = engine.generate_rag_answer("PSL final?", budget=budget)
+        return answer, sources, budget
+
+    def test_fast_request_is_not_degraded(self):
+        answer, sources, budget = self._answer(10, retrieval=1, generation=1)
+        self.assertTrue(answer.startswith("Offline answer"))
+        self.assertEqual(len(sources), 5)
+        self.assertEqual(budget.degradations, [])
+
+    def test_slow_retrieval_shrinks_context(self):
+        answer, sources, budget = self._answer(10, retrieval=6, generation=1)
+        self.assertEqual(budget.degradations, ["shrunk_context"])
+        self.assertEqual(len(sources), SHRUNK_TOP_K)
+        self.assertEqual(self.llm.prompts[0].count("--- Document "), SHRUNK_TOP_K)
+
+    def test_small_budget_alone_does_not_shrink_context(self):
+        # The shrink decision depends on time left after retrieval, not on the budget size
+        answer, sources, budget = self._answer(5.5, retrieval=0.1, generation=1)
+        self.assertEqual(budget.degradations, [])
+        self.assertEqual(len(sources), 5)
+
+    def test_exhausted_budget_returns_sources_only(self):
+        answer, sources, budget = self._answer(10, retrieval=9)
+        self.assertEqual(answer, SOURCES_ONLY_ANSWER)
+        self.assertEqual(budget.degradations, ["sources_only"])
+        self.assertEqual(len(sources), 5)
+        self.assertEqual(self.llm.prompts, [])
+
+    def test_generation_timeout_returns_sources(self):
+        answer, sources, budget = self._answer(10, retrieval=1, generation=30)
+        self.assertEqual(answer, SOURCES_ONLY_ANSWER)
+        self.assertEqual(budget.degradations, ["generation_timeout"])
+        self.assertTrue(budget.expired())
+
+    def test_plain_answer_shares_the_page_budget(self):
+        engine = RAGEngine(SlowVectorStore(self.clock), model=SlowLLM(self.clock, latency=30))
+        budget = RequestBudget(10)
+        engine.generate_plain_answer("PSL final?", budget=budget)
+        self.assertEqual(budget.degradations, ["plain_answer_timeout"])
+
+        engine.generate_plain_answer("PSL final?", budget=budget)
+        self.assertEqual(budget.degradations, ["plain_answer_timeout", "skipped_plain_answer"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+import json
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from latency_budget import RequestBudget
+from metadata_index import MetadataIndex
+from result_cache import ResultCache
+from search_service import MicroBatcher, RAGService, RAGServiceClient, create_server
+
+DOCUMENTS = [
+    {"text": "PSL final in Lahore", "metadata": {"title": "PSL", "newspaper": "The News", "date": "20250601"}},
+    {"text": "Fuel prices raised", "metadata": {"title": "Fuel", "newspaper": "Dawn", "date": "20250602"}},
+    {"text": "Floods in Sindh", "metadata": {"title": "Floods", "newspaper": "The News", "date": "20250603"}},
+]
+
+class StubVectorStore:
+    """In-memory stand-in for VectorStore that records every search_batch call."""
+    def __init__(self, documents=DOCUMENTS):
+        self.documents = documents
+        self.index = object()
+        self.cache = ResultCache()
+        self.metadata_index = MetadataIndex.from_documents(documents)
+        self.calls = []
+        self.fail = False
+        self._lock = threading.Lock()
+
+    def search_batch(self, queries, top_k=5, **filters):
+        with self._lock:
+            self.calls.append((list(queries), top_k, filters))
+        if self.fail:
+            raise RuntimeError("index unavailable")
+        mask = self.filter_mask(**{k: v for k, v in filters.items() if k not in ("unit", "aggregation")})
+        docs = [doc for i, doc in enumerate(self.documents) if mask is None or mask[i]]
+        return [[dict(doc, query=q) for doc in docs[:top_k]] for q in queries]
+
+    def filter_mask(self, newspaper_filter=None, date_filter=None, date_range=None, sentiment_filter=None):
+        date_from, date_to = date_range if date_range else (None, None)
+        if date_filter:
+            date_from = date_to = date_filter
+        return self.metadata_index.filter(
+            facets={"newspaper": newspaper_filter, "sentiment": sentiment_filter},
+            date_from=date_from, date_to=date_to,
+        )
+
+class StubRAGEngine:
+    def generate_rag_answer(self, query, persona="Default", temperature=0.7, budget=None, **filters):
+        budget.degrade("shrunk_context")
+        return f"Answer to {query}", DOCUMENTS[:1]
+
+    def generate_plain_answer(self, query, persona="Default", temperature=0.7, budget=None):
+        return f"Plain answer to {query}"
+
+class MicroBatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.store = StubVectorStore()
+        # A long wait makes requests submitted back to back land in the same batch
+        self.batcher = MicroBatcher(self.store, max_batch_size=8, max_wait_ms=200, result_timeout=5)
+
+    def tearDown(self):
+        if not self.batcher._closed:
+            self.batcher.close()
+
+    def test_groups_concurrent_requests_by_parameters(self):
+        futures = [self.batcher.submit(f"q{i}", top_k=1, newspaper_filter="The News") for i in range(3)]
+        futures += [self.batcher.submit(f"d{i}", top_k=1, newspaper_filter="Dawn") for i in range(2)]
+        results = [f.result(timeout=5) for f in futures]
+
+        self.assertEqual(sorted(len(queries) for queries, _, _ in self.store.calls), [2, 3])
+        self.assertEqual([r[0]["query"] for r in results], ["q0", "q1", "q2", "d0", "d1"])
+        self.assertEqual(results[3][0]["metadata"]["newspaper"], "Dawn")
+
+    def test_respects_max_batch_size(self):
+        self.batcher.max_batch_size = 2
+        results = self.batcher.search_batch([f"q{i}" for i in range(5)], top_k=1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(len(queries) <= 2 for queries, _, _ in self.store.calls))
+
+    def test_list_filters_are_grouped(self):
+        results = self.batcher.search_batch(["a", "b"], top_k=3, date_range=["20250602", "20250603"])
+        self.assertEqual(len(self.store.calls), 1)
+        self.assertEqual([d["metadata"]["title"] for d in results[0]], ["Fuel", "Floods"])
+
+    def test_unhashable_filter_is_rejected_without_killing_the_worker(self):
+        with self.assertRaises(TypeError):
+            self.batcher.submit("q", newspaper_filter={"x": 1})
+        self.assertTrue(self.batcher._worker.is_alive())
+        self.assertEqual(len(self.batcher.search("q", top_k=1)), 1)
+
+    def test_search_errors_reach_callers_and_worker_survives(self):
+        self.store.fail = True
+        with self.assertRaises(RuntimeError):
+            self.batcher.search("q")
+        self.store.fail = False
+        self.assertTrue(self.batcher._worker.is_alive())
+        self.assertEqual(len(self.batcher.search("q", top_k=2)), 2)
+
+    def test_close_finishes_queued_requests_and_rejects_new_ones(self):
+        futures = [self.batcher.submit(f"q{i}", top_k=1) for i in range(3)]
+        self.batcher.close()
+        self.assertFalse(self.batcher._worker.is_alive())
+        self.assertTrue(all(len(f.result(timeout=0)) == 1 for f in futures))
+        with self.assertRaises(RuntimeError):
+            self.batcher.submit("late")
+
+class HTTPRoutesTest(unittest.TestCase):
+    def setUp(self):
+        self.store = StubVectorStore()
+        self.service = RAGService(self.store, rag_engine=StubRAGEngine(), max_wait_ms=1)
+        self.server = create_server(self.service, port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.client = RAGServiceClient(self.base_url, timeout=5)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.service.close()
+
+    def _post(self, path, body):
+        request = urllib.request.Request(
+            self.base_url + path, data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_health(self):
+        health = self.client.health()
+        self.assertEqual(health["status"], "ok")
+        self.assertEqual(health["documents"], 3)
+        self.assertIn("hit_rate", health["cache"])
+
+    def test_search_and_search_batch(self):
+        results = self.client.search("floods", top_k=2, newspaper_filter="The News")
+        self.assertEqual([d["metadata"]["title"] for d in results], ["PSL", "Floods"])
+
+        batch = self.client.search_batch(["a", "b", "c"], top_k=1)
+        self.assertEqual([r[0]["query"] for r in batch], ["a", "b", "c"])
+
+    def test_facets(self):
+        body = self.client.facets(newspaper_filter="The News")
+        self.assertEqual(body["counts"]["newspaper"], {"Dawn": 0, "The News": 2})
+        self.assertEqual(body["dates"], ["20250601", "20250602", "20250603"])
+
+    def test_answer_reports_degradations(self):
+        budget = RequestBudget(10)
+        answer, sources = self.client.generate_rag_answer("PSL?", budget=budget)
+        self.assertEqual(answer, "Answer to PSL?")
+        self.assertEqual(sources[0]["metadata"]["title"], "PSL")
+        self.assertEqual(budget.degradations, ["shrunk_context"])
+        self.assertEqual(self.client.generate_plain_answer("PSL?"), "Plain answer to PSL?")
+
+    def test_bad_requests(self):
+        status, body = self._post("/search", {"top_k": 2})
+        self.assertEqual(status, 400)
+        status, body = self._post("/search", {"query": "q", "newspaper_filter": {"x": 1}})
+        self.assertEqual(status, 400)
+        status, body = self._post("/nope", {})
+        self.assertEqual(status, 404)
+        # The batcher is still serving after the rejected requests
+        self.assertEqual(len(self.client.search("q", top_k=1)), 1)
+
+    def test_concurrent_requests_are_batched(self):
+        self.service.batcher.max_wait = 0.2
+        results = [None] * 6
+
+        def search(i):
+            results[i] = self.client.search(f"q{i}", top_k=1)
+
+        threads = [threading.Thread(target=search, args=(i,)) for i in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5)
+        self.assertEqual([r[0]["query"] for r in results], [f"q{i}" for i in range(6)])
+        self.assertLess(len(self.store.calls), 6)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,106 +1,497 @@
 import os
+import copy
 import pickle
+import shutil
+import itertools
+import threading
+from datetime import datetime
 import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
+from data_loader import split_passages
+from encoders import load_query_model, encoder_agreement, MIN_AGREEMENT
+from metadata_index import MetadataIndex
+from result_cache import ResultCache, DEFAULT_CACHE_SIZE
 
 VECTOR_STORE_DIR = "vector_store"
-INDEX_FILE = os.path.join(VECTOR_STORE_DIR, "index.faiss")
-METADATA_FILE = os.path.join(VECTOR_STORE_DIR, "metadata.pkl")
+INDEX_FILENAME = "index.faiss"
+METADATA_FILENAME = "metadata.pkl"
+CHUNKS_FILENAME = "chunks.npz"
+# Legacy single-version layout, still loaded when no versioned index exists
+INDEX_FILE = os.path.join(VECTOR_STORE_DIR, INDEX_FILENAME)
+METADATA_FILE = os.path.join(VECTOR_STORE_DIR, METADATA_FILENAME)
+# Versioned layout: versions/<version>/{index.faiss,metadata.pkl} plus a CURRENT pointer file
+VERSIONS_DIR = os.path.join(VECTOR_STORE_DIR, "versions")
+CURRENT_FILE = os.path.join(VECTOR_STORE_DIR, "CURRENT")
+KEEP_VERSIONS = 3
+WATCH_INTERVAL_SECONDS = 30
 MODEL_NAME = "all-MiniLM-L6-v2"
+# "float" or "int8" (dynamically quantized, CPU) for query encoding; documents are always encoded in float
+QUERY_ENCODER_BACKEND = "float"
+QUERY_ENCODER_THREADS = None # torch intra-op threads; None keeps torch's default
+# Passage hits fetched per requested article, so enough distinct articles survive aggregation
+PASSAGE_FETCH_FACTOR = 4
+# A partial snapshot is published during a background build once the index has grown by this factor
+# since the last one, so the copies made for publishing cost O(total) instead of O(total * batches)
+PARTIAL_PUBLISH_GROWTH = 2.0
+
+_snapshot_generations = itertools.count()
+
+class IndexSnapshot:
+    """An immutable index version. Searches hold on to one snapshot, so a swap never changes it mid-request."""
+    def __init__(self, version, index, documents, chunk_parents=None, chunk_spans=None, partial=False):
+        self.version = version
+        # True while a background build is still adding documents
+        self.partial = partial
+        # Unique per snapshot, so unsaved builds and reloads of the same version never share cached results
+        self.generation = next(_snapshot_generations)
+        self.index = index
+        self.documents = documents # List of dicts: {'text': ..., 'metadata': ...}
+        self.metadata_index = MetadataIndex.from_documents(documents)
+        # Index vectors are passages: chunk_parents[i] is the document of vector i and chunk_spans[i]
+        # its (start, end) offsets in the document text. Indexes from before passages were introduced
+        # hold one vector per document.
+        if chunk_parents is None:
+            chunk_parents = np.arange(len(documents), dtype=np.int32)
+            chunk_spans = np.array([(0, len(doc['text'])) for doc in documents], dtype=np.int32).reshape(-1, 2)
+        self.chunk_parents = chunk_parents
+        self.chunk_spans = chunk_spans
+
+    def with_version(self, version):
+        """Returns a copy of this snapshot labelled `version`, sharing its index, documents and metadata index."""
+        snapshot = copy.copy(self)
+        snapshot.version = version
+        return snapshot
+
+    def passage(self, chunk_id):
+        """Returns a matched passage as a document dict carrying its parent article's metadata."""
+        doc = self.documents[self.chunk_parents[chunk_id]]
+        start, end = self.chunk_spans[chunk_id]
+        return {'text': doc['text'][start:end], 'metadata': doc['metadata']}
+
+class BuildProgress:
+    """Thread-safe progress of a background index build."""
+    def __init__(self, total_batches=None):
+        self._lock = threading.Lock()
+        self.total_batches = total_batches
+        self.done_batches = 0
+        self.documents = 0
+        self.last_batch = None
+        self.finished = False
+        self.error = None
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "total_batches": self.total_batches,
+                "done_batches": self.done_batches,
+                "documents": self.documents,
+                "last_batch": self.last_batch,
+                "finished": self.finished,
+                "error": self.error,
+            }
 
 class VectorStore:
-    def __init__(self):
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE, encoder_backend=QUERY_ENCODER_BACKEND,
+                 encoder_threads=QUERY_ENCODER_THREADS):
         self.model = SentenceTransformer(MODEL_NAME)
-        self.index = None
-        self.documents = [] # List of dicts: {'text': ..., 'metadata': ...}
+        self.query_model, self.encoder_backend, self.encoder_agreement = self._load_query_model(
+            encoder_backend, encoder_threads
+        )
+        self.cache = ResultCache(cache_size)
+        self._snapshot = IndexSnapshot(None, None, [])
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self.build_progress = None
+
+    def _load_query_model(self, backend, num_threads):
+        """Loads the query encoder, falling back to float if its embeddings drift from the document encoder."""
+        query_model = load_query_model(self.model, backend, num_threads)
+        if query_model is self.model:
+            return query_model, backend, None
+
+        agreement = encoder_agreement(self.model, query_model)
+        print(f"Query encoder '{backend}': cosine agreement with float mean={agreement['mean']:.4f} "
+              f"min={agreement['min']:.4f}")
+        if agreement["min"] < MIN_AGREEMENT:
+            print(f"Agreement below {MIN_AGREEMENT}; using the float query encoder instead.")
+            return self.model, "float", agreement
+        return query_model, backend, agreement
+
+    @property
+    def index(self):
+        return self._snapshot.index
+
+    @property
+    def documents(self):
+        return self._snapshot.documents
+
+    @property
+    def metadata_index(self):
+        return self._snapshot.metadata_index
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    @property
+    def is_partial(self):
+        return self._snapshot.partial
 
     def build_index(self, documents):
         """
-        Builds a FAISS index from the given documents.
+        Builds a FAISS index over sentence-aligned passages of the given documents.
         """
-        self.documents = documents
-        texts = [doc['text'] for doc in documents]
-        
         print("Encoding documents...")
-        embeddings = self.model.encode(texts, show_progress_bar=True)
+        embeddings, parents, spans = self._encode_passages(documents, show_progress_bar=True)
+        
+        dimension = embeddings.shape[1]
+        index = faiss.IndexFlatL2(dimension)
+        index.add(embeddings)
+        self._snapshot = IndexSnapshot(None, index, documents, parents, spans)
+        print(f"Index built with {len(documents)} documents ({index.ntotal} passages).")
+
+    def _encode_passages(self, documents, first_doc_id=0, show_progress_bar=False):
+        """
+        Splits documents into passages and encodes them, so long articles are not truncated by the encoder.
+        Returns (float32 embeddings, parent document ids, (start, end) spans).
+        """
+        texts, parents, spans = [], [], []
+        for doc_id, doc in enumerate(documents, first_doc_id):
+            # Every passage after the first is prefixed with the title to keep the article's topic
+            title_prefix = f"Title: {doc['metadata'].get('title', '')}\n"
+            for start, end in split_passages(doc['text']) or [(0, len(doc['text']))]:
+                passage = doc['text'][start:end]
+                texts.append(passage if start == 0 else title_prefix + passage)
+                parents.append(doc_id)
+                spans.append((start, end))
+
+        embeddings = self.model.encode(texts, show_progress_bar=show_progress_bar)
         
         # Convert to float32 for FAISS
         embeddings = np.array(embeddings).astype('float32')
-        
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(embeddings)
-        print(f"Index built with {self.index.ntotal} documents.")
+        return embeddings, np.array(parents, dtype=np.int32), np.array(spans, dtype=np.int32).reshape(-1, 2)
+
+    def build_index_in_background(self, batches, total_batches=None, save=True):
+        """
+        Builds the index on a background thread from an iterable of (label, documents) batches.
+        Partial snapshots are published as the index grows (after the first batch, then each time it has
+        doubled), so searches cover most of what is indexed instead of waiting for the whole build.
+        Returns the BuildProgress, also kept in `build_progress`.
+        """
+        progress = BuildProgress(total_batches)
+        self.build_progress = progress
+        worker = threading.Thread(
+            target=self._build_batches, args=(batches, progress, save), name="index-builder", daemon=True
+        )
+        worker.start()
+        return progress
+
+    def _build_batches(self, batches, progress, save):
+        documents = []
+        parents, spans = [], []
+        index = None
+        published = 0
+        try:
+            for label, batch in batches:
+                if not batch:
+                    continue
+                embeddings, batch_parents, batch_spans = self._encode_passages(batch, first_doc_id=len(documents))
+
+                # The working index and lists are private to this thread and grow in place
+                if index is None:
+                    index = faiss.IndexFlatL2(embeddings.shape[1])
+                index.add(embeddings)
+                documents.extend(batch)
+                parents.append(batch_parents)
+                spans.append(batch_spans)
+
+                if index.ntotal >= published * PARTIAL_PUBLISH_GROWTH:
+                    # Published snapshots are never mutated, so they get copies of the working state
+                    self._snapshot = IndexSnapshot(
+                        None, faiss.clone_index(index), list(documents),
+                        np.concatenate(parents), np.concatenate(spans), partial=True
+                    )
+                    published = index.ntotal
+                progress.update(
+                    done_batches=progress.done_batches + 1, documents=len(documents), last_batch=label
+                )
+
+            if index is None:
+                raise ValueError("No documents to index.")
+            self._snapshot = IndexSnapshot(None, index, documents, np.concatenate(parents), np.concatenate(spans))
+            print(f"Index built with {len(documents)} documents ({index.ntotal} passages).")
+            if save:
+                self.save_index()
+            progress.update(finished=True)
+        except Exception as e:
+            print(f"Background index build failed: {e}")
+            progress.update(finished=True, error=str(e))
 
     def save_index(self):
-        """Saves the index and documents (metadata) to disk."""
-        if not os.path.exists(VECTOR_STORE_DIR):
-            os.makedirs(VECTOR_STORE_DIR)
-            
-        faiss.write_index(self.index, INDEX_FILE)
-        with open(METADATA_FILE, "wb") as f:
-            pickle.dump(self.documents, f)
-        print(f"Index saved to {VECTOR_STORE_DIR}")
+        """
+        Saves the index and documents (metadata) to disk as a new version,
+        then atomically points CURRENT at it so running workers can pick it up.
+        """
+        snapshot = self._snapshot
+        version = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        version_dir = os.path.join(VERSIONS_DIR, version)
+        os.makedirs(version_dir)
+
+        faiss.write_index(snapshot.index, os.path.join(version_dir, INDEX_FILENAME))
+        with open(os.path.join(version_dir, METADATA_FILENAME), "wb") as f:
+            pickle.dump(snapshot.documents, f)
+        np.savez(os.path.join(version_dir, CHUNKS_FILENAME), parents=snapshot.chunk_parents, spans=snapshot.chunk_spans)
+
+        # Serve the saved version under its name before CURRENT points at it, so the watcher never
+        # reloads it. Searches holding the unnamed snapshot keep it unchanged.
+        if self._snapshot is snapshot:
+            self._snapshot = snapshot.with_version(version)
+
+        tmp_pointer = CURRENT_FILE + ".tmp"
+        with open(tmp_pointer, "w") as f:
+            f.write(version)
+        os.replace(tmp_pointer, CURRENT_FILE)
+
+        self._prune_versions()
+        print(f"Index saved to {version_dir}")
 
     def load_index(self):
-        """Loads the index and documents from disk."""
-        if not os.path.exists(INDEX_FILE) or not os.path.exists(METADATA_FILE):
+        """Loads the current index version and documents from disk."""
+        version = self._current_version()
+        if version is not None:
+            index_file = os.path.join(VERSIONS_DIR, version, INDEX_FILENAME)
+            metadata_file = os.path.join(VERSIONS_DIR, version, METADATA_FILENAME)
+        else:
+            index_file, metadata_file = INDEX_FILE, METADATA_FILE
+
+        if not os.path.exists(index_file) or not os.path.exists(metadata_file):
             print("Index not found.")
             return False
-            
-        self.index = faiss.read_index(INDEX_FILE)
-        with open(METADATA_FILE, "rb") as f:
-            self.documents = pickle.load(f)
-        print(f"Index loaded with {self.index.ntotal} documents.")
+
+        self._snapshot = self._read_snapshot(version, index_file, metadata_file)
+        print(f"Index loaded with {len(self.documents)} documents ({self.index.ntotal} passages).")
         return True
 
-    def search(self, query, top_k=5, newspaper_filter=None, date_filter=None):
+    def start_watcher(self, interval=WATCH_INTERVAL_SECONDS):
+        """
+        Starts a background thread that swaps in a new index version when CURRENT changes.
+        In-flight searches finish on the snapshot they started with.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="index-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def reload_if_changed(self):
+        """Loads the version CURRENT points to if it differs from the one being served. Returns True on swap."""
+        version = self._current_version()
+        if version is None or version == self.version:
+            return False
+        version_dir = os.path.join(VERSIONS_DIR, version)
+        self._snapshot = self._read_snapshot(
+            version,
+            os.path.join(version_dir, INDEX_FILENAME),
+            os.path.join(version_dir, METADATA_FILENAME),
+        )
+        print(f"Swapped to index version {version} ({len(self.documents)} documents).")
+        return True
+
+    def _watch(self, interval):
+        while not self._stop_watching.wait(interval):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                # Keep serving the current version; the next poll retries.
+                print(f"Index reload failed: {e}")
+
+    @staticmethod
+    def _read_snapshot(version, index_file, metadata_file):
+        # Memory-map the vectors instead of copying them, so loads are fast and pages are shared across workers
+        flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+        index = faiss.read_index(index_file, flags)
+        with open(metadata_file, "rb") as f:
+            documents = pickle.load(f)
+        parents = spans = None
+        chunks_file = os.path.join(os.path.dirname(index_file), CHUNKS_FILENAME)
+        if os.path.exists(chunks_file):
+            with np.load(chunks_file) as chunks:
+                parents, spans = chunks["parents"], chunks["spans"]
+        return IndexSnapshot(version, index, documents, parents, spans)
+
+    @staticmethod
+    def _current_version():
+        if not os.path.exists(CURRENT_FILE):
+            return None
+        with open(CURRENT_FILE) as f:
+            return f.read().strip() or None
+
+    def _prune_versions(self):
+        """Removes all but the newest KEEP_VERSIONS versions. Mapped files stay readable until unmapped."""
+        versions = sorted(os.listdir(VERSIONS_DIR))
+        for old in versions[:-KEEP_VERSIONS]:
+            if old != self.version:
+                shutil.rmtree(os.path.join(VERSIONS_DIR, old), ignore_errors=True)
+
+    def search(self, query, top_k=5, newspaper_filter=None, date_filter=None,
+               date_range=None, sentiment_filter=None, unit="articles", aggregation="max"):
         """
         Searches the index for the query.
         Returns top_k matching documents with metadata.
+        See search_batch for `unit` and `aggregation`.
+        """
+        return self.search_batch(
+            [query], top_k, newspaper_filter, date_filter, date_range, sentiment_filter, unit, aggregation
+        )[0]
+
+    def search_batch(self, queries, top_k=5, newspaper_filter=None, date_filter=None,
+                     date_range=None, sentiment_filter=None, unit="articles", aggregation="max"):
         """
-        if self.index is None:
+        Searches the index for several queries with a single encode and FAISS call.
+        Returns one list of top_k matching documents per query.
+        The index holds passages: with unit="articles" passage hits are grouped per article
+        (scored by their best passage with aggregation="max", or all matched passages with "sum")
+        and whole de-duplicated articles are returned; with unit="passages" only the matched
+        passages are returned, each with its article's metadata.
+        Cached queries are answered without touching the encoder or FAISS.
+        """
+        if unit not in ("articles", "passages"):
+            raise ValueError(f"Unknown unit: {unit}")
+        if aggregation not in ("max", "sum"):
+            raise ValueError(f"Unknown aggregation: {aggregation}")
+
+        # Pin one snapshot so a concurrent version swap cannot mix indexes within this request
+        snapshot = self._snapshot
+        if snapshot.index is None:
             raise ValueError("Index not loaded or built.")
+        if not queries:
+            return []
 
-        query_vector = self.model.encode([query]).astype('float32')
-        
-        # We retrieve more than top_k initially to allow for filtering
-        fetch_k = top_k * 5 
-        distances, indices = self.index.search(query_vector, fetch_k)
-        
-        results = []
-        for i, idx in enumerate(indices[0]):
-            if idx == -1: continue
-            
-            doc = self.documents[idx]
-            metadata = doc['metadata']
-            
-            # Apply filters
-            if newspaper_filter and newspaper_filter != "All":
-                if metadata['newspaper'] != newspaper_filter:
-                    continue
-            
-            # simple date filtering (exact match for now, could be range)
-            if date_filter:
-                # Assuming date_filter format YYYYMMDD
-                if metadata['date'] != date_filter:
-                    continue
-            
-            results.append(doc)
-            if len(results) >= top_k:
-                break
-                
+        filters = {
+            "newspaper_filter": newspaper_filter,
+            "date_filter": date_filter,
+            "date_range": date_range,
+            "sentiment_filter": sentiment_filter,
+        }
+        keys = [
+            self.cache.make_key(q, (snapshot.version, snapshot.generation), top_k,
+                                unit=unit, aggregation=aggregation, **filters)
+            for q in queries
+        ]
+        hits = [self.cache.get(key) for key in keys]
+        missing = [i for i, hit in enumerate(hits) if hit is None]
+
+        if missing:
+            results = self._search_ids(snapshot, [queries[i] for i in missing], top_k, filters, unit, aggregation)
+            for i, (ids, scores) in zip(missing, results):
+                self.cache.put(keys[i], ids, scores)
+                hits[i] = (ids, scores)
+
+        if unit == "passages":
+            return [[snapshot.passage(idx) for idx in ids] for ids, _ in hits]
+        return [[snapshot.documents[idx] for idx in ids] for ids, _ in hits]
+
+    def _search_ids(self, snapshot, queries, top_k, filters, unit, aggregation):
+        """
+        Encodes and searches `queries`, returning (ids, similarity scores) per query.
+        Ids are passage ids for unit="passages" and document ids otherwise.
+        """
+        mask = self.filter_mask(snapshot=snapshot, **filters)
+        if mask is not None and not mask.any():
+            return [([], []) for _ in queries]
+
+        query_vectors = np.asarray(self.query_model.encode(list(queries))).astype('float32')
+
+        # Filters are applied inside FAISS, so only passages of allowed documents are ever scored
+        params = None
+        if mask is not None:
+            selector = faiss.IDSelectorBitmap(np.packbits(mask[snapshot.chunk_parents], bitorder='little'))
+            params = faiss.SearchParameters(sel=selector)
+        if unit == "passages":
+            distances, indices = snapshot.index.search(query_vectors, top_k, params=params)
+            return [_passage_hits(row_ids, row_distances) for row_ids, row_distances in zip(indices, distances)]
+
+        # A long article can fill all fetched passages, so queries that end up with fewer than
+        # top_k distinct articles are searched again with a doubled fetch_k until the index is exhausted.
+        if snapshot.index.ntotal == 0:
+            return [([], []) for _ in queries]
+        results = [None] * len(queries)
+        pending = list(range(len(queries)))
+        fetch_k = min(top_k * PASSAGE_FETCH_FACTOR, snapshot.index.ntotal)
+        while pending:
+            distances, indices = snapshot.index.search(query_vectors[pending], fetch_k, params=params)
+            retry = []
+            for i, row_ids, row_distances in zip(pending, indices, distances):
+                chunk_ids, scores = _passage_hits(row_ids, row_distances)
+                results[i] = _aggregate_by_parent(
+                    snapshot.chunk_parents[chunk_ids], np.asarray(scores), top_k, aggregation
+                )
+                ids = results[i][0]
+                exhausted = fetch_k >= snapshot.index.ntotal or len(chunk_ids) < fetch_k
+                if len(ids) < top_k and not exhausted:
+                    retry.append(i)
+            pending = retry
+            fetch_k = min(fetch_k * 2, snapshot.index.ntotal)
         return results
 
+    def filter_mask(self, newspaper_filter=None, date_filter=None, date_range=None, sentiment_filter=None,
+                    snapshot=None):
+        """
+        Evaluates the filters against the metadata index.
+        `date_filter` is an exact YYYYMMDD date, `date_range` an inclusive (from, to) pair.
+        Returns a boolean mask over documents, or None when no filter is active.
+        """
+        date_from, date_to = date_range if date_range else (None, None)
+        if date_filter:
+            date_from = date_to = date_filter
+        return (snapshot or self._snapshot).metadata_index.filter(
+            facets={"newspaper": newspaper_filter, "sentiment": sentiment_filter},
+            date_from=date_from,
+            date_to=date_to,
+        )
+
+def _passage_hits(row_ids, row_distances):
+    """Drops FAISS padding (-1) and converts L2 distances to similarities so passage scores can be summed."""
+    keep = row_ids != -1
+    return row_ids[keep].tolist(), (1.0 / (1.0 + row_distances[keep])).tolist()
+
+def _aggregate_by_parent(parents, scores, top_k, aggregation):
+    """Groups passage hits (sorted best first) by parent document and returns the top_k (ids, scores)."""
+    totals = {}
+    for parent, score in zip(parents.tolist(), scores.tolist()):
+        if aggregation == "sum":
+            totals[parent] = totals.get(parent, 0.0) + score
+        elif parent not in totals:
+            totals[parent] = score
+    ranked = sorted(totals.items(), key=lambda x: x[1], reverse=True)[:top_k]
+    return [parent for parent, _ in ranked], [score for _, score in ranked]
+
 if __name__ == "__main__":
-    # Test
+    # Builds the index if missing (or a new version with --rebuild), then runs a test query
+    import argparse
     from data_loader import load_all_csvs, preprocess_documents
-    
+
+    parser = argparse.ArgumentParser(description="Build the news index and run a test query.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Build and publish a new index version even if one exists; running apps swap to it.")
+    args = parser.parse_args()
+
     print("Initializing VectorStore...")
     vs = VectorStore()
     
-    if not vs.load_index():
+    if args.rebuild or not vs.load_index():
         print("Building new index...")
         df = load_all_csvs()
         docs = preprocess_documents(df)